@@ -1,44 +1,205 @@
+from concurrent.futures import ThreadPoolExecutor
+import heapq
+import itertools
+
+import numpy as np
+
 from arbitrage_helper.node import *
-from arbitrage_helper.route import Route, RouteGenerator
+from arbitrage_helper.route import Route, RouteGenerator, LoopRules
+from arbitrage_helper.graph import CurrencyGraph, ReturnTable
+from arbitrage_helper.evaluator import RouteEvaluator
+from arbitrage_helper.topology import TopologyCache
+from arbitrage_helper.parallel import ParallelEnumerator
+from arbitrage_helper.sizing import TradeSizer
+from arbitrage_helper.history import QuoteRecorder
+from arbitrage_helper.metrics import metrics
+
+
+Scored = Tuple[float, int, Route, Optional[Tuple[Balance, ...]]]  # perc, tiebreak, route, cached balances
 
 
 class Arbitrage:
+    BATCH_SIZE = 65536
+
     def __init__(self):
         pass
 
-    def run(self, max_size: int, start_balance: Balance, crypto: bool):
-        ################################################################
-        # Prep data
+    def run(self, max_size: int, start_balance: Balance, crypto: bool, graph: bool = False, compiled: bool = False,
+            top_k: Optional[int] = None, async_parse: bool = False, cache_topology: bool = False,
+            rules: LoopRules = LoopRules(), min_profit: Optional[float] = None, processes: Optional[int] = None,
+            max_amount: Optional[float] = None, amounts: Optional[Sequence[float]] = None,
+            recorder: Optional[QuoteRecorder] = None, metrics_path: Optional[str] = None,
+            concurrency: int = 50, per_host: Optional[int] = None):
+        # Worker processes enumerate and score on their own, neither flag would be used
+        if processes is not None and not graph and (compiled or cache_topology):
+            raise ValueError("processes can't be combined with compiled or cache_topology")
+
+        # Metrics stay on for this run only
+        with metrics.scope(enabled=metrics_path is not None):
+            ################################################################
+            # Prep data
+            route_gen = RouteGenerator()
+            nodes = route_gen.all_nodes(crypto=crypto)
+
+            with ThreadPoolExecutor(max_workers=1) as ex, metrics.phase("parse"):
+                # Topologies don't need prices, enumerate them over every node while parsing
+                if cache_topology and not graph:
+                    topologies = ex.submit(self.cached_routes, route_gen=RouteGenerator(), nodes=dict(nodes),
+                                           max_size=max_size, currency=start_balance.currency, rules=rules)
+
+                if async_parse:
+                    nodes = route_gen.parse_nodes_async(nodes=nodes, concurrency=concurrency, per_host=per_host, recorder=recorder)
+                else:
+                    nodes = route_gen.parse_nodes(nodes=nodes, workers=25, recorder=recorder)
+
+            if processes is not None and not graph:
+                # Enumerated and scored in worker processes
+                routes = None
+            elif cache_topology and not graph:
+                # Drop loops through nodes that didn't parse
+                valid = set(map(id, nodes.values()))
+                routes = (route for route in topologies.result() if all(id(node) in valid for node in route.nodes))
+            elif graph:
+                # Negative cycle detection, max_size doesn't apply
+                routes = iter(CurrencyGraph(nodes=nodes).profitable_routes(currency=start_balance.currency))
+            else:
+                routes = itertools.chain.from_iterable(
+                    route_gen.smartgen_loop_routes(nodes=nodes, size=size, currency=start_balance.currency, rules=rules,
+                                                   min_profit=min_profit)
+                    for size in range(2, max_size+1))
+
+            ################################################################
+            # Score every route once, keep profitable, generators make enumeration part of this phase
+            with metrics.phase("search"):
+                if routes is None:
+                    enumerator = ParallelEnumerator(nodes=nodes, rules=rules)
+                    best = enumerator.run(start_balance=start_balance, max_size=max_size, processes=processes, top_k=top_k,
+                                          min_profit=min_profit or 0.0)
+                    metrics.routes("profitable", enumerator.profitable)
+                elif compiled:
+                    scored = self.score_routes_compiled(start_balance=start_balance, routes=routes, evaluator=RouteEvaluator(nodes=nodes))
+                    best = self.select_best(scored=scored, top_k=top_k)
+                else:
+                    scored = self.score_routes(start_balance=start_balance, routes=routes)
+                    best = self.select_best(scored=scored, top_k=top_k)
+
+            ################################################################
+            # Print profitable
+            with metrics.phase("report"):
+                self.print_best(start_balance=start_balance, best=best, max_amount=max_amount, amounts=amounts)
+
+            if metrics_path is not None:
+                metrics.write(metrics_path)
+
+    def print_best(self, start_balance: Balance, best: List[Scored], max_amount: Optional[float] = None,
+                   amounts: Optional[Sequence[float]] = None):
+        for perc, _, route, balances in best:
+            if balances is None:
+                balances = route.forward(start_balance)
+
+            profit, perc = self.analyze_route(start_balance=start_balance, route=route, balances=balances)
+            if not perc > 0:
+                # Scored on a rate that doesn't hold at this amount, or nan past the book depth
+                continue
+
+            report = self.generate_report(start_balance=start_balance, route=route, balances=balances)
+            print("----------------------------------------------------------------")
+            print(f"{profit} ({perc:.3f}%)")
+            if max_amount is not None:
+                print(self.sizing_report(start_balance=start_balance, route=route, max_amount=max_amount))
+            if amounts is not None:
+                print(self.curve_report(start_balance=start_balance, route=route, amounts=amounts))
+            print(report)
+
+    def scan_loops(self, max_size: int, start_balances: Sequence[Balance], crypto: bool, async_parse: bool = False):
+        """Best loop of every length for each held balance, one DP pass over all start currencies"""
         route_gen = RouteGenerator()
         nodes = route_gen.all_nodes(crypto=crypto)
-        nodes = route_gen.parse_nodes(nodes=nodes, workers=25)
-
-        routes = []
-        for size in range(2, max_size+1):
-            routes += list(route_gen.smartgen_loop_routes(nodes=nodes, size=size, currency=start_balance.currency))
-
-        ################################################################
-        # Print profitable
-        routes.sort(key=lambda r: self.analyze_route(start_balance=start_balance, route=r)[1])
-        for route in routes:
-            profit, perc = self.analyze_route(start_balance=start_balance, route=route)
-            if perc > 0:
-                report = self.generate_report(start_balance=start_balance, route=route)
+        if async_parse:
+            nodes = route_gen.parse_nodes_async(nodes=nodes, concurrency=50)
+        else:
+            nodes = route_gen.parse_nodes(nodes=nodes, workers=25)
+
+        loops = ReturnTable(nodes=nodes, max_hops=max_size).best_loops(currencies=[balance.currency for balance in start_balances])
+        for start_balance in start_balances:
+            for _, route in loops[start_balance.currency]:
+                balances = route.forward(start_balance)
+                profit, perc = self.analyze_route(start_balance=start_balance, route=route, balances=balances)
                 print("----------------------------------------------------------------")
-                print(f"{profit} ({perc:.3f}%)")
-                print(report)
+                print(f"{len(route)} hops: {profit} ({perc:.3f}%)")
+                print(self.generate_report(start_balance=start_balance, route=route, balances=balances))
+
+    def sizing_report(self, start_balance: Balance, route: Route, max_amount: float) -> str:
+        sizing = TradeSizer().size(route=route, currency=start_balance.currency, max_amount=max_amount)
+        currency = start_balance.currency.repr
+        report = f"Best size {sizing.amount:.6g} {currency}: {sizing.profit:.6g} {currency} ({sizing.perc:.3f}%)"
+        if sizing.break_even is not None:
+            report += f", break-even {sizing.break_even[0]:.6g}..{sizing.break_even[1]:.6g} {currency}"
+        return report
+
+    def curve_report(self, start_balance: Balance, route: Route, amounts: Sequence[float]) -> str:
+        """Profit at every amount tier, one forward pass for all of them"""
+        tiers = Balance(amounts, currency=start_balance.currency)
+        profit, perc = self.analyze_route(start_balance=tiers, route=route)
+        currency = start_balance.currency.repr
+
+        return "\n".join(f"{amount:.6g} {currency}: {p:+.6g} {currency} ({pc:.3f}%)"
+                         for amount, p, pc in zip(tiers.value.tolist(), profit.value.tolist(), perc.tolist()))
+
+    def cached_routes(self, route_gen: RouteGenerator, nodes: Dict[str, GenericNode], max_size: int,
+                      currency: CEnum, rules: LoopRules = LoopRules()) -> List[Route]:
+        cache = TopologyCache()
+        return list(itertools.chain.from_iterable(
+            cache.routes(route_gen=route_gen, nodes=nodes, currency=currency, size=size, rules=rules)
+            for size in range(2, max_size+1)))
+
+    def score_routes(self, start_balance: Balance, routes: Iterable[Route]) -> Generator[Scored, None, None]:
+        for i, route in enumerate(routes):
+            balances = route.forward(start_balance)
+            yield (balances[-1] / start_balance - 1) * 100, i, route, balances
+
+    def score_routes_compiled(self, start_balance: Balance, routes: Iterable[Route],
+                              evaluator: RouteEvaluator) -> Generator[Scored, None, None]:
+        """Vectorized scoring in fixed size batches, balances are left for the report"""
+        counter = itertools.count()
+        while batch := list(itertools.islice(routes, self.BATCH_SIZE)):
+            end_values = evaluator.evaluate(routes=batch, start_balance=start_balance)
+            for route, end_value in zip(batch, end_values):
+                yield float(end_value / start_balance.value - 1) * 100, next(counter), route, None
+
+    def select_best(self, scored: Iterable[Scored], top_k: Optional[int] = None) -> List[Scored]:
+        """Profitable routes only, at most top_k of them, worst to best"""
+        heap = []
+        evaluated = profitable = 0
+        for item in scored:
+            evaluated += 1
+            if not item[0] > 0:  # nan when the amount doesn't fit the books
+                continue
+            profitable += 1
+
+            if top_k is None or len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item[0] > heap[0][0]:
+                heapq.heapreplace(heap, item)
+
+        metrics.routes("evaluated", evaluated)
+        metrics.routes("profitable", profitable)
+        return sorted(heap, key=lambda item: item[:2])
 
-    def analyze_route(self, start_balance: Balance, route: Route) -> Tuple[Balance, float]:
-        end_balance = route.forward(start_balance)[-1]
+    def analyze_route(self, start_balance: Balance, route: Route,
+                      balances: Optional[Tuple[Balance, ...]] = None) -> Tuple[Balance, Union[float, np.ndarray]]:
+        """Profit and %, arrays of them for an array start_balance"""
+        end_balance = (balances or route.forward(start_balance))[-1]
         profit = end_balance - start_balance
         perc = (end_balance / start_balance - 1) * 100
 
         return profit, perc
 
-    def generate_report(self, start_balance: Balance, route: Route) -> str:
+    def generate_report(self, start_balance: Balance, route: Route,
+                        balances: Optional[Tuple[Balance, ...]] = None) -> str:
         report = ""
 
-        balances = route.forward(start_balance)
+        balances = balances or route.forward(start_balance)
         nodes = route.nodes
 
         for i in range(len(balances)-1):
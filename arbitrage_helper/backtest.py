@@ -0,0 +1,207 @@
+from typing import *
+
+import numpy as np
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.evaluator import RouteEvaluator
+from arbitrage_helper.history import QuoteRecorder
+
+
+class QuoteHistory:
+    """Recorded rows as dense snapshot x node windows, nodes missing from a snapshot keep their last quote"""
+
+    def __init__(self, recorder: QuoteRecorder):
+        self.aliases = list(recorder.aliases)
+        self.rows = recorder.read()
+
+        # Rows are appended in time order, a snapshot is a run of equal ts
+        ts = self.rows["ts"]
+        self._bounds = np.concatenate([[0], np.flatnonzero(ts[1:] != ts[:-1]) + 1, [len(ts)]]) if len(ts) else np.zeros(1, dtype=np.intp)
+        self.ts = np.asarray(ts[self._bounds[:-1]])
+
+    def __len__(self):
+        return len(self.ts)
+
+    def rows_between(self, start: int, stop: int) -> Dict[str, np.ndarray]:
+        """Column views of rows start..stop"""
+        return {name: column[start:stop] for name, column in self.rows.items()}
+
+    def window(self, start: int, stop: int, columns: Optional[np.ndarray] = None,
+               carry: Optional[Tuple[np.ndarray, ...]] = None) -> Tuple[np.ndarray, ...]:
+        """buy, sell, valid of snapshots start..stop as (nodes, snapshots), only the node ids in columns (all by default)
+
+        carry is the last snapshot of the previous window, node-major so a node's series is one contiguous row."""
+        columns = np.arange(len(self.aliases)) if columns is None else np.asarray(columns)
+        n_nodes, n_snaps = len(columns), stop - start
+        if carry is None:
+            carry = (np.full(n_nodes, np.nan), np.full(n_nodes, np.nan), np.zeros(n_nodes, dtype=np.bool_))
+
+        local = np.full(len(self.aliases), -1, dtype=np.intp)
+        local[columns] = np.arange(n_nodes)
+
+        rows = self.rows_between(self._bounds[start], self._bounds[stop])
+        nodes = local[rows["node"]]
+        keep = nodes >= 0
+        rows, nodes = {name: rows[name][keep] for name in ["ts", "buy", "sell", "valid"]}, nodes[keep]
+        snaps = np.searchsorted(self.ts, rows["ts"]) - start
+
+        # Index of the last snapshot each node was seen in, -1 falls back to carry
+        seen = np.full((n_nodes, n_snaps), -1, dtype=np.intp)
+        seen[nodes, snaps] = snaps
+        seen = np.maximum.accumulate(seen, axis=1)
+
+        window = []
+        for column, last in zip(["buy", "sell", "valid"], carry):
+            dense = np.empty((n_nodes, n_snaps), dtype=last.dtype)
+            dense[nodes, snaps] = rows[column]
+            window.append(np.where(seen >= 0, np.take_along_axis(dense, np.maximum(seen, 0), axis=1), last[:, None]))
+
+        return tuple(window)
+
+    def state(self, snapshot: int) -> Tuple[np.ndarray, ...]:
+        """buy, sell, valid of every node as of snapshot"""
+        rows = self.rows_between(0, self._bounds[snapshot + 1])
+        nodes, last = np.unique(rows["node"][::-1], return_index=True)
+        last = len(rows["node"]) - 1 - last
+
+        state = (np.full(len(self.aliases), np.nan), np.full(len(self.aliases), np.nan), np.zeros(len(self.aliases), dtype=np.bool_))
+        for column, values in zip(["buy", "sell", "valid"], state):
+            values[nodes] = rows[column][last]
+        return state
+
+    def windows(self, size: int, columns: Optional[np.ndarray] = None) -> Generator[Tuple[int, int, Tuple[np.ndarray, ...]], None, None]:
+        carry = None
+        for start in range(0, len(self), size):
+            stop = min(start + size, len(self))
+            window = self.window(start=start, stop=stop, columns=columns, carry=carry)
+            carry = tuple(column[:, -1] for column in window)
+            yield start, stop, window
+
+
+class LoopStats(NamedTuple):
+    """Per route arrays over the whole history"""
+    time_above: np.ndarray  # Seconds above the threshold, a snapshot lasts until the next one
+    share: np.ndarray  # time_above / recorded time
+    episodes: np.ndarray  # Number of times it went above
+    longest: np.ndarray  # Longest episode, seconds
+    best: np.ndarray  # Best %
+
+
+class Backtest:
+    """Replay of recorded quotes without network
+
+    Prices are injected into the usual nodes, so Route.forward and RouteGenerator work on any snapshot,
+    and whole route sets are scored over the time axis at once with the RouteEvaluator hop rules."""
+
+    CELLS = 1 << 22  # snapshot x route cells evaluated at once
+
+    def __init__(self, recorder: QuoteRecorder, nodes: Dict[str, GenericNode]):
+        self.history = QuoteHistory(recorder)
+        self.nodes = nodes
+
+        # Fee nodes aren't quoted, their slots keep the evaluator values
+        self._evaluator = RouteEvaluator(nodes=nodes)
+        self._columns = {alias: k for k, alias in enumerate(self.history.aliases)}
+        self._fees = np.array([i for i, node in enumerate(self._evaluator.nodes) if isinstance(node, (FixedFee, PercFee))], dtype=np.intp)
+        self._slots = [(self._evaluator.index(node), self._columns[alias], node.trader_mode) for alias, node in nodes.items()
+                       if alias in self._columns and not isinstance(node, (FixedFee, PercFee))]
+
+    def inject(self, snapshot: int) -> float:
+        """Set node prices as of snapshot, nodes invalid there get the class defaults, returns its ts"""
+        buy, sell, valid = self.history.state(snapshot)
+        for alias, node in self.nodes.items():
+            if (k := self._columns.get(alias)) is None or isinstance(node, (FixedFee, PercFee)):
+                continue
+            if valid[k]:
+                node._buy_price, node._sell_price = float(buy[k]), float(sell[k])
+            else:
+                node._buy_price, node._sell_price = type(node)._buy_price, type(node)._sell_price
+
+        return float(self.history.ts[snapshot])
+
+    def valid_nodes(self) -> Dict[str, GenericNode]:
+        """Nodes valid in at least one snapshot, ready for RouteGenerator"""
+        valid = np.zeros(len(self.history.aliases), dtype=np.bool_)
+        valid[self.history.rows["node"][self.history.rows["valid"]]] = True
+        quoted = {alias for alias, ok in zip(self.history.aliases, valid.tolist()) if ok}
+        return {alias: node for alias, node in self.nodes.items() if alias in quoted or isinstance(node, (FixedFee, PercFee))}
+
+    def end_values(self, indices: np.ndarray, directions: np.ndarray, start_value: float,
+                   buy: np.ndarray, sell: np.ndarray) -> np.ndarray:
+        """RouteEvaluator.end_values with (slots, snapshots) prices, result is (routes, snapshots)"""
+        values = np.full((indices.shape[0], buy.shape[1]), start_value, dtype=np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for j in range(indices.shape[1]):
+                idx = indices[:, j]
+                valid = idx >= 0
+                forward = valid & directions[:, j]
+                backward = valid & ~directions[:, j]
+
+                values[forward] = values[forward] * sell[idx[forward]] - self._evaluator.fee[idx[forward], None]
+                values[backward] = values[backward] / buy[idx[backward]] - self._evaluator.fee[idx[backward], None]
+
+        return values
+
+    def prices(self, window: Tuple[np.ndarray, ...], slots: List[Tuple[int, int, bool]]) -> Tuple[np.ndarray, np.ndarray]:
+        """History window over slots' columns -> evaluator slot prices
+
+        nan where the node was invalid or has no history at all, live prices never leak into a replay.
+        Fee nodes aren't quoted and keep their configured values."""
+        buy, sell, valid = window
+        slot_buy = np.full((len(self._evaluator.nodes), buy.shape[1]), np.nan)
+        slot_sell = np.full((len(self._evaluator.nodes), buy.shape[1]), np.nan)
+        slot_buy[self._fees] = self._evaluator.buy[self._fees, None]
+        slot_sell[self._fees] = self._evaluator.sell[self._fees, None]
+        for k, (i, _, trader_mode) in enumerate(slots):
+            b, s = (sell[k], buy[k]) if trader_mode else (buy[k], sell[k])
+            slot_buy[i] = np.where(valid[k], b, np.nan)
+            slot_sell[i] = np.where(valid[k], s, np.nan)
+
+        return slot_buy, slot_sell
+
+    def profits(self, routes: Sequence[Route], start_balance: Balance) -> Generator[Tuple[np.ndarray, np.ndarray], None, None]:
+        """(ts, % of every route as (routes, snapshots)) in time blocks, nan where a node had no valid quote"""
+        indices, directions = self._evaluator.compile(routes=routes, currency=start_balance.currency)
+
+        # Only nodes on the routes are read from history
+        used = set(np.unique(indices[indices >= 0]).tolist())
+        slots = [slot for slot in self._slots if slot[0] in used]
+        columns = np.array([k for _, k, _ in slots], dtype=np.intp)
+
+        size = max(1, self.CELLS // max(len(routes), 1))
+        for start, stop, window in self.history.windows(size=size, columns=columns):
+            buy, sell = self.prices(window, slots=slots)
+            end_values = self.end_values(indices, directions, start_value=start_balance.value, buy=buy, sell=sell)
+            yield self.history.ts[start:stop], (end_values / start_balance.value - 1) * 100
+
+    def loop_stats(self, routes: Sequence[Route], start_balance: Balance, threshold: float = 0.0) -> LoopStats:
+        """How often and for how long every route stayed above threshold %"""
+        n = len(routes)
+        time_above, episodes = np.zeros(n), np.zeros(n, dtype=np.int64)
+        longest, best = np.zeros(n), np.full(n, -np.inf)
+        run, above_before = np.zeros(n), np.zeros(n, dtype=np.bool_)
+
+        # Snapshot lasts until the next one, the last one has no known length
+        dt = np.append(np.diff(self.history.ts), 0.0)
+
+        for ts, perc in self.profits(routes=routes, start_balance=start_balance):
+            above = perc > threshold
+            block_dt = dt[np.searchsorted(self.history.ts, ts)][None, :]
+
+            episodes += (above & ~np.hstack([above_before[:, None], above[:, :-1]])).sum(axis=1)
+            time_above += (block_dt * above).sum(axis=1)
+            best = np.fmax(best, np.nanmax(np.where(np.isnan(perc), -np.inf, perc), axis=1))
+
+            # Running episode length, reset to the cumulative sum at every snapshot below threshold
+            cumulative = run[:, None] + np.cumsum(block_dt * above, axis=1)
+            reset = np.maximum.accumulate(np.where(above, 0.0, cumulative), axis=1)
+            runs = cumulative - reset
+            longest = np.maximum(longest, runs.max(axis=1))
+            run, above_before = runs[:, -1], above[:, -1]
+
+        total = self.history.ts[-1] - self.history.ts[0] if len(self.history) > 1 else 0.0
+        share = time_above / total if total > 0 else np.zeros(n)
+        return LoopStats(time_above=time_above, share=share, episodes=episodes, longest=longest, best=best)
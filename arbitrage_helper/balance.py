@@ -1,8 +1,16 @@
+from typing import *
+
+import numpy as np
+
 from arbitrage_helper.currency import CEnum
 
 
 class Balance:
-    def __init__(self, value: float, currency: CEnum):
+    """Amount of currency, value may be an array of amounts to push many through a route at once"""
+
+    def __init__(self, value: Union[float, Sequence[float], np.ndarray], currency: CEnum):
+        if isinstance(value, (list, tuple)):
+            value = np.asarray(value, dtype=np.float64)
         self._value = value
         self._currency = currency
 
@@ -26,7 +34,7 @@ class Balance:
         return Balance(value=self.value - other.value, currency=self.currency)
 
     def __eq__(self, other):
-        return self.value == other.value and self.currency == other.currency
+        return bool(np.all(self.value == other.value)) and self.currency == other.currency
 
     def __truediv__(self, other):
         assert self.currency == other.currency
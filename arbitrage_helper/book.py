@@ -0,0 +1,72 @@
+from typing import *
+
+import numpy as np
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.evaluator import RouteEvaluator
+from arbitrage_helper.arbitrage import Scored
+
+
+class RouteBook:
+    """Routes with their last scores, only routes through changed nodes get re-scored"""
+
+    def __init__(self, routes: List[Route], nodes: Dict[str, GenericNode], start_balance: Balance):
+        self.routes = routes
+        self.start_balance = start_balance
+
+        self._evaluator = RouteEvaluator(nodes=nodes)
+        self._indices, self._directions = self._evaluator.compile(routes=routes, currency=start_balance.currency)
+        self._by_node = self._reverse_index(self._indices, n_nodes=len(self._evaluator.nodes))
+
+        self.end_values = np.empty(len(routes), dtype=np.float64)
+        self.profitable: Dict[int, float] = {}  # route id -> perc
+        self.update()
+
+    @staticmethod
+    def _reverse_index(indices: np.ndarray, n_nodes: int) -> List[np.ndarray]:
+        """Node slot -> ids of the routes containing it"""
+        rows = np.repeat(np.arange(indices.shape[0]), indices.shape[1])
+        slots = indices.ravel()
+        rows, slots = rows[slots >= 0], slots[slots >= 0]
+
+        order = np.argsort(slots, kind="stable")
+        bounds = np.searchsorted(slots[order], np.arange(n_nodes + 1))
+        return [np.unique(rows[order[bounds[k]:bounds[k+1]]]) for k in range(n_nodes)]
+
+    def routes_with(self, node: GenericNode) -> np.ndarray:
+        return self._by_node[self._evaluator.index(node)]
+
+    def update(self, changed: Optional[Iterable[GenericNode]] = None) -> np.ndarray:
+        """Re-read prices of changed nodes (all by default), re-score their routes, return the dirty route ids"""
+        if changed is None:
+            self._evaluator.refresh()
+            dirty = np.arange(len(self.routes))
+        else:
+            changed = list(changed)
+            self._evaluator.refresh(nodes=changed)
+            dirty = np.unique(np.concatenate([self.routes_with(node) for node in changed] or [np.empty(0, dtype=np.int64)]))
+
+        if len(dirty) == 0:
+            return dirty
+
+        start = self.start_balance.value
+        self.end_values[dirty] = self._evaluator.end_values(self._indices[dirty], self._directions[dirty], start_value=start)
+
+        # Patch ranked set in place
+        for i, end_value in zip(dirty.tolist(), self.end_values[dirty].tolist()):
+            if end_value > start:
+                self.profitable[i] = (end_value / start - 1) * 100
+            else:
+                self.profitable.pop(i, None)
+
+        return dirty
+
+    def best(self, top_k: Optional[int] = None) -> List[Scored]:
+        """Profitable routes, at most top_k of them, worst to best"""
+        ranked = sorted(self.profitable.items(), key=lambda item: (item[1], item[0]))
+        if top_k is not None:
+            ranked = ranked[-top_k:] if top_k > 0 else []
+
+        return [(perc, i, self.routes[i], None) for i, perc in ranked]
@@ -0,0 +1,143 @@
+from typing import *
+import itertools
+import time
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route, RouteGenerator, LoopRules
+from arbitrage_helper.arbitrage import Arbitrage, Scored
+from arbitrage_helper.book import RouteBook
+from arbitrage_helper.history import QuoteRecorder
+from arbitrage_helper.metrics import metrics
+
+
+class Scanner:
+    """Long running scan, nodes and routes stay in memory and every source refreshes on its own interval"""
+
+    INTERVALS: Dict[type, float] = {
+        BinanceExchange: 5,
+        GarantexExchange: 10,
+        CryptologyExchange: 10,
+        BinanceP2P: 30,
+        Vexel: 60,
+        Tinkoff: 60,
+        Paysera: 300,
+        MOEX: 300,
+        KASE: 300,
+        GenericPaysend: 600,
+    }
+    DEFAULT_INTERVAL = 60
+
+    def __init__(self, max_size: int, start_balance: Balance, crypto: bool,
+                 intervals: Optional[Dict[type, float]] = None, top_k: Optional[int] = None, workers: int = 25,
+                 on_opportunity: Optional[Callable[[Scored], None]] = None, rules: LoopRules = LoopRules(),
+                 recorder: Optional[QuoteRecorder] = None, metrics_path: Optional[str] = None):
+        self.max_size = max_size
+        self.start_balance = start_balance
+        self.crypto = crypto
+        self.intervals = {**self.INTERVALS, **(intervals or {})}
+        self.top_k = top_k
+        self.workers = workers
+        self.rules = rules
+        self.recorder = recorder
+        self.metrics_path = metrics_path
+        self.on_opportunity = on_opportunity or self.print_opportunity
+
+        self.arbitrage = Arbitrage()
+        self.route_gen = RouteGenerator()
+        self.nodes: Dict[str, GenericNode] = {}
+        self.book: Optional[RouteBook] = None
+        self.opportunities: Dict[Tuple[int, ...], Scored] = {}
+
+        self._sources: Dict[type, Dict[str, GenericNode]] = {}
+        self._due: Dict[type, float] = {}
+
+    def source(self, node: GenericNode) -> type:
+        """Closest class with a configured interval"""
+        return next((cls for cls in type(node).__mro__ if cls in self.intervals), type(node))
+
+    def start(self):
+        """Parse everything once and enumerate routes over the nodes that came back valid"""
+        with metrics.phase("parse"):
+            self.nodes = self.route_gen.parse_nodes(nodes=self.route_gen.all_nodes(crypto=self.crypto), workers=self.workers,
+                                                   recorder=self.recorder)
+
+        self._sources = {}
+        for alias, node in self.nodes.items():
+            self._sources.setdefault(self.source(node), {})[alias] = node
+
+        now = time.monotonic()
+        self._due = {source: now + self.intervals.get(source, self.DEFAULT_INTERVAL) for source in self._sources}
+
+        with metrics.phase("enumerate"):
+            routes = list(itertools.chain.from_iterable(
+                self.route_gen.smartgen_loop_routes(nodes=self.nodes, size=size, currency=self.start_balance.currency, rules=self.rules)
+                for size in range(2, self.max_size+1)))
+        self.book = RouteBook(routes=routes, nodes=self.nodes, start_balance=self.start_balance)
+
+        self.scan()
+
+    @property
+    def routes(self) -> List[Route]:
+        return self.book.routes if self.book is not None else []
+
+    def refresh(self, sources: Iterable[type]) -> List[GenericNode]:
+        """Re-parse the sources, return nodes whose prices moved"""
+        nodes = {alias: node for source in sources for alias, node in self._sources[source].items()}
+        before = {alias: (node.buy_price, node.sell_price) for alias, node in nodes.items()}
+
+        with metrics.phase("refresh"):
+            self.route_gen.refresh_nodes(nodes=nodes, workers=self.workers, progress=False, recorder=self.recorder)
+
+        return [node for alias, node in nodes.items() if before[alias] != (node.buy_price, node.sell_price)]
+
+    def scan(self, changed: Optional[List[GenericNode]] = None) -> List[Scored]:
+        """Re-score routes through changed nodes (all by default), emit opportunities that weren't there on the last scan"""
+        with metrics.phase("scan"):
+            dirty = self.book.update(changed=changed)
+            best = self.book.best(top_k=self.top_k)
+        metrics.routes("evaluated", len(dirty))
+        metrics.routes("profitable", len(self.book.profitable))
+
+        opportunities = {}
+        for item in best:
+            key = tuple(map(id, item[2].nodes))
+            if key not in self.opportunities:
+                # Fill at the real book before alerting, a new one that loses there can come back on a later scan
+                if not self.arbitrage.analyze_route(start_balance=self.start_balance, route=item[2])[1] > 0:
+                    continue
+                self.on_opportunity(item)
+            opportunities[key] = item
+
+        self.opportunities = opportunities
+        if self.metrics_path is not None:
+            metrics.write(self.metrics_path)
+        return best
+
+    def run(self, duration: Optional[float] = None):
+        """Refresh due sources and rescan when prices change, forever or for duration seconds"""
+        # Metrics stay on while the scanner runs
+        with metrics.scope(enabled=self.metrics_path is not None):
+            self.start()
+            deadline = None if duration is None else time.monotonic() + duration
+
+            while deadline is None or time.monotonic() < deadline:
+                now = time.monotonic()
+                if due := [source for source, at in self._due.items() if at <= now]:
+                    for source in due:
+                        self._due[source] = now + self.intervals.get(source, self.DEFAULT_INTERVAL)
+
+                    if changed := self.refresh(due):
+                        self.scan(changed=changed)
+                else:
+                    wake = min(self._due.values())
+                    if deadline is not None:
+                        wake = min(wake, deadline)
+                    time.sleep(max(0.0, wake - now))
+
+    def print_opportunity(self, item: Scored):
+        perc, _, route, _ = item
+        balances = route.forward(self.start_balance)
+        profit, perc = self.arbitrage.analyze_route(start_balance=self.start_balance, route=route, balances=balances)
+        print("----------------------------------------------------------------")
+        print(f"{time.strftime('%H:%M:%S')} {profit} ({perc:.3f}%)")
+        print(self.arbitrage.generate_report(start_balance=self.start_balance, route=route, balances=balances))
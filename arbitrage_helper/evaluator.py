@@ -0,0 +1,102 @@
+from typing import *
+
+import numpy as np
+
+from arbitrage_helper.node import *
+from arbitrage_helper.node.depth import Depth
+from arbitrage_helper.route import Route
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.currency import *
+
+
+class RouteEvaluator:
+    """Route evaluation over packed price arrays
+
+    Every node is one slot in contiguous buy/sell/fee arrays, a hop is either value * sell - fee
+    (base -> quote) or value / buy - fee (quote -> base), same as GenericNode.exchange.
+    Slots with book depth walk it instead, grouped per slot so each is one vectorized fill."""
+
+    def __init__(self, nodes: Dict[str, GenericNode]):
+        self._nodes = list(nodes.values())
+        self._index = {id(node): i for i, node in enumerate(self._nodes)}
+
+        self.buy = np.ones(len(self._nodes), dtype=np.float64)
+        self.sell = np.ones(len(self._nodes), dtype=np.float64)
+        self.fee = np.zeros(len(self._nodes), dtype=np.float64)
+        self.asks: Dict[int, Depth] = {}
+        self.bids: Dict[int, Depth] = {}
+        self.refresh()
+
+    @property
+    def nodes(self) -> List[GenericNode]:
+        return self._nodes
+
+    def index(self, node: GenericNode) -> int:
+        return self._index[id(node)]
+
+    def refresh(self, nodes: Optional[Iterable[GenericNode]] = None):
+        """Re-read prices from the nodes, all of them by default, call after parsing"""
+        slots = range(len(self._nodes)) if nodes is None else [self._index[id(node)] for node in nodes]
+        for i in slots:
+            node = self._nodes[i]
+            if isinstance(node, FixedFee):
+                self.buy[i], self.sell[i], self.fee[i] = 1.0, 1.0, node.fee_value
+            elif isinstance(node, PercFee):
+                self.buy[i], self.sell[i], self.fee[i] = 100 / (100 - node.fee_perc), (100 - node.fee_perc) / 100, 0.0
+            else:
+                self.buy[i], self.sell[i], self.fee[i] = node.buy_price, node.sell_price, 0.0
+
+            # Trader mode places limit orders, exchange doesn't walk the book there either
+            for book, depth in [(self.asks, node.asks), (self.bids, node.bids)]:
+                if depth is not None and not node.trader_mode:
+                    book[i] = depth
+                else:
+                    book.pop(i, None)
+
+    def compile(self, routes: Sequence[Route], currency: CEnum) -> Tuple[np.ndarray, np.ndarray]:
+        """Routes -> node index matrix padded with -1 and matching direction flags (True for base -> quote)"""
+        width = max((len(route) for route in routes), default=0)
+        indices = np.full((len(routes), width), -1, dtype=np.int32)
+        directions = np.zeros((len(routes), width), dtype=np.bool_)
+
+        for i, route in enumerate(routes):
+            c = currency
+            for j, node in enumerate(route.nodes):
+                indices[i, j] = self._index[id(node)]
+                directions[i, j] = c == node.base or c != node.quote
+                c = node.currency_convert(c) or c
+
+        return indices, directions
+
+    def end_values(self, indices: np.ndarray, directions: np.ndarray, start_value: float) -> np.ndarray:
+        values = np.full(indices.shape[0], start_value, dtype=np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for j in range(indices.shape[1]):
+                idx = indices[:, j]
+                valid = idx >= 0
+                idx = np.where(valid, idx, 0)
+
+                step = np.where(directions[:, j], values * self.sell[idx], values / self.buy[idx]) - self.fee[idx]
+                if self.asks or self.bids:
+                    self._fill_depth(step, values=values, idx=idx, valid=valid, directions=directions[:, j])
+                values = np.where(valid, step, values)
+
+        return values
+
+    def _fill_depth(self, step: np.ndarray, values: np.ndarray, idx: np.ndarray, valid: np.ndarray, directions: np.ndarray):
+        """Overwrite step of hops through slots with depth, in place"""
+        for book, side, walk in [(self.bids, directions, "sell"), (self.asks, ~directions, "buy")]:
+            rows = np.flatnonzero(valid & side)
+            if not book or len(rows) == 0:
+                continue
+            slots = idx[rows]
+            for i in np.unique(slots).tolist():
+                if (depth := book.get(i)) is not None:
+                    hit = rows[slots == i]
+                    step[hit] = getattr(depth, walk)(values[hit]) - self.fee[i]
+
+    def evaluate(self, routes: Sequence[Route], start_balance: Balance) -> np.ndarray:
+        """End values of every route when started with start_balance"""
+        indices, directions = self.compile(routes=routes, currency=start_balance.currency)
+        return self.end_values(indices=indices, directions=directions, start_value=start_balance.value)
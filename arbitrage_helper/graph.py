@@ -0,0 +1,215 @@
+from typing import *
+from collections import deque
+import math
+
+import numpy as np
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route
+from arbitrage_helper.currency import *
+
+
+Edge = Tuple[CEnum, CEnum, float, GenericNode]  # from, to, -log(rate), node
+
+
+class CurrencyGraph:
+    EPS = 1e-12
+
+    def __init__(self, nodes: Dict[str, GenericNode]):
+        self._edges: List[Edge] = []
+        self._currencies: Set[CEnum] = set()
+
+        for node in nodes.values():
+            # Fees don't convert anything
+            if node.base == node.quote:
+                continue
+
+            # Non-positive prices have no log, rate() gives 0.0 for them
+            for currency in [node.base, node.quote]:
+                rate = node.rate(currency)
+                if rate > 0 and math.isfinite(rate):
+                    self._edges.append((currency, node.currency_convert(currency), -math.log(rate), node))
+                    self._currencies.update([node.base, node.quote])
+
+    @property
+    def edges(self) -> List[Edge]:
+        return self._edges
+
+    @property
+    def currencies(self) -> Set[CEnum]:
+        return self._currencies
+
+    def profitable_routes(self, currency: CEnum, max_routes: int = 100) -> List[Route]:
+        """Find negative cycles reachable from currency, break each one on its worst edge and search again"""
+        routes = []
+        seen = set()
+        banned = set()
+
+        for _ in range(len(self._edges)):
+            if len(routes) >= max_routes:
+                break
+
+            if (cycle := self._find_negative_cycle(currency=currency, banned=banned)) is None:
+                break
+            banned.add(id(max(cycle, key=lambda e: e[2])))
+
+            if (route_edges := self._close_loop(currency=currency, cycle=cycle, banned=banned)) is None:
+                continue
+
+            key = tuple(id(edge[3]) for edge in route_edges)
+            if key not in seen and sum(edge[2] for edge in route_edges) < -self.EPS:
+                seen.add(key)
+                routes.append(Route([edge[3] for edge in route_edges]))
+
+        return routes
+
+    def _find_negative_cycle(self, currency: CEnum, banned: Set[int]) -> Optional[List[Edge]]:
+        dist = {currency: 0.0}
+        pred: Dict[CEnum, Edge] = {}
+
+        relaxed = None
+        for _ in range(len(self._currencies) + 1):
+            relaxed = None
+            for edge in self._edges:
+                u, v, w, _ = edge
+                if u in dist and id(edge) not in banned and dist[u] + w < dist.get(v, math.inf) - self.EPS:
+                    dist[v] = dist[u] + w
+                    pred[v] = edge
+                    relaxed = v
+
+            # SPFA style early exit, no relaxation means no negative cycle
+            if relaxed is None:
+                return None
+
+        # Step back far enough to land on the cycle itself
+        v = relaxed
+        for _ in range(len(self._currencies)):
+            v = pred[v][0]
+
+        cycle = []
+        u = v
+        while True:
+            edge = pred[u]
+            cycle.append(edge)
+            u = edge[0]
+            if u == v:
+                break
+
+        cycle.reverse()
+        return cycle
+
+    def _close_loop(self, currency: CEnum, cycle: List[Edge], banned: Set[int]) -> Optional[List[Edge]]:
+        """Rotate cycle to start from currency, or attach shortest paths to and from it"""
+        for i, edge in enumerate(cycle):
+            if edge[0] == currency:
+                return cycle[i:] + cycle[:i]
+
+        entry = cycle[0][0]
+        path_in = self._shortest_path(src=currency, dst=entry, banned=banned)
+        path_out = self._shortest_path(src=entry, dst=currency, banned=banned)
+        if path_in is None or path_out is None:
+            return None
+
+        return path_in + cycle + path_out
+
+    def _shortest_path(self, src: CEnum, dst: CEnum, banned: Set[int]) -> Optional[List[Edge]]:
+        """Fewest hops, BFS"""
+        pred: Dict[CEnum, Optional[Edge]] = {src: None}
+        queue = deque([src])
+        while queue:
+            u = queue.popleft()
+            if u == dst:
+                break
+
+            for edge in self._edges:
+                if edge[0] == u and edge[1] not in pred and id(edge) not in banned:
+                    pred[edge[1]] = edge
+                    queue.append(edge[1])
+
+        if dst not in pred:
+            return None
+
+        path = []
+        v = dst
+        while (edge := pred[v]) is not None:
+            path.append(edge)
+            v = edge[0]
+
+        path.reverse()
+        return path
+
+
+class ReturnTable:
+    """Best k-hop returns between every pair of currencies, max-product DP over the currency adjacency
+
+    returns[k][s, d] is the best multiplicative return of a k-hop walk from s to d, loops are the diagonal.
+    Walks may pass a currency twice and go back and forth over the same node, fee nodes are skipped as in
+    CurrencyGraph, so a return is an upper bound for the routes RouteGenerator builds, not an achievable one."""
+
+    def __init__(self, nodes: Dict[str, GenericNode], max_hops: int):
+        self.currencies: List[CEnum] = []
+        self._index: Dict[CEnum, int] = {}
+        for node in nodes.values():
+            if node.base != node.quote:
+                for currency in [node.base, node.quote]:
+                    self._index.setdefault(currency, len(self.currencies))
+                    if len(self.currencies) < len(self._index):
+                        self.currencies.append(currency)
+
+        # Best single node for every directed pair
+        n = len(self.currencies)
+        self.rates = np.zeros((n, n), dtype=np.float64)
+        self._edges: Dict[Tuple[int, int], GenericNode] = {}
+        for node in nodes.values():
+            if node.base == node.quote:
+                continue
+
+            for currency in [node.base, node.quote]:
+                rate = node.rate(currency)
+                u, v = self._index[currency], self._index[node.currency_convert(currency)]
+                if 0 < rate < math.inf and rate > self.rates[u, v]:
+                    self.rates[u, v] = rate
+                    self._edges[(u, v)] = node
+
+        # returns[k] = returns[k-1] (max, *) rates, pointers[k][s, d] = currency before d
+        self.returns = np.zeros((max_hops + 1, n, n), dtype=np.float64)
+        self.returns[0] = np.eye(n)
+        self.pointers = np.zeros((max_hops + 1, n, n), dtype=np.int32)
+        for k in range(1, max_hops + 1):
+            candidates = self.returns[k-1][:, :, None] * self.rates[None, :, :]
+            self.pointers[k] = candidates.argmax(axis=1)
+            self.returns[k] = np.take_along_axis(candidates, self.pointers[k][:, None, :], axis=1)[:, 0, :]
+
+    @property
+    def max_hops(self) -> int:
+        return self.returns.shape[0] - 1
+
+    def best_return(self, src: CEnum, dst: CEnum, hops: int) -> float:
+        if src not in self._index or dst not in self._index:
+            return 0.0
+        return float(self.returns[hops, self._index[src], self._index[dst]])
+
+    def route(self, src: CEnum, dst: CEnum, hops: int) -> Optional[Route]:
+        """Walk behind best_return rebuilt from the pointers, None if dst is unreachable in exactly hops"""
+        if self.best_return(src=src, dst=dst, hops=hops) <= 0:
+            return None
+
+        s, v = self._index[src], self._index[dst]
+        nodes = []
+        for k in range(hops, 0, -1):
+            u = int(self.pointers[k, s, v])
+            nodes.append(self._edges[(u, v)])
+            v = u
+
+        nodes.reverse()
+        return Route(nodes)
+
+    def best_loops(self, currencies: Optional[Iterable[CEnum]] = None) -> Dict[CEnum, List[Tuple[float, Route]]]:
+        """Best loop of every length 2..max_hops for each currency (all by default), as (return, route)"""
+        loops = {}
+        for currency in (self.currencies if currencies is None else currencies):
+            loops[currency] = [(self.best_return(src=currency, dst=currency, hops=k), route)
+                               for k in range(2, self.max_hops + 1)
+                               if (route := self.route(src=currency, dst=currency, hops=k)) is not None]
+
+        return loops
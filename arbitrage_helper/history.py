@@ -0,0 +1,108 @@
+from typing import *
+import os
+import time
+
+import numpy as np
+
+from arbitrage_helper.node import *
+
+
+QUOTE_COLUMNS = {
+    "ts": np.dtype("<f8"),  # Snapshot wall time, shared by every row of a snapshot
+    "node": np.dtype("<u4"),  # Id in the node dictionary
+    "buy": np.dtype("<f8"),  # Ask as parsed, trader mode isn't applied
+    "sell": np.dtype("<f8"),  # Bid
+    "latency": np.dtype("<f4"),  # Seconds spent parsing, whole batch for batched classes
+    "valid": np.dtype("?"),
+}
+
+
+class QuoteRecorder:
+    """Append-only quote history, one file per column (ts.f8, node.u4, ...) and node aliases in nodes.txt
+
+    Line i of nodes.txt is node id i, every file is only ever appended to, so a reader can
+    memory-map the columns at any time and read a field without touching the others."""
+
+    NODES = "nodes.txt"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+        self._aliases: List[str] = []
+        self._ids: Dict[str, int] = {}
+        if os.path.exists(self.nodes_path):
+            with open(self.nodes_path, encoding="utf-8") as file:
+                for alias in file.read().splitlines():
+                    self._ids[alias] = len(self._aliases)
+                    self._aliases.append(alias)
+
+        # A crash mid-append leaves columns of different lengths or a torn value, keep whole rows only
+        count = self._count()
+        for name, dtype in QUOTE_COLUMNS.items():
+            path = self.column_path(name)
+            if os.path.exists(path) and os.path.getsize(path) != count * dtype.itemsize:
+                os.truncate(path, count * dtype.itemsize)
+
+    def column_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.{QUOTE_COLUMNS[name].kind}{QUOTE_COLUMNS[name].itemsize}")
+
+    @property
+    def nodes_path(self) -> str:
+        return os.path.join(self.directory, self.NODES)
+
+    @property
+    def aliases(self) -> List[str]:
+        return self._aliases
+
+    def _count(self) -> int:
+        """Rows present in every column"""
+        return min(os.path.getsize(path) // dtype.itemsize if os.path.exists(path := self.column_path(name)) else 0
+                   for name, dtype in QUOTE_COLUMNS.items())
+
+    def node_ids(self, aliases: Iterable[str]) -> List[int]:
+        """Ids of aliases, new ones are added to the dictionary"""
+        new = []
+        ids = []
+        for alias in aliases:
+            if alias not in self._ids:
+                self._ids[alias] = len(self._aliases)
+                self._aliases.append(alias)
+                new.append(alias)
+            ids.append(self._ids[alias])
+
+        # Dictionary goes first, rows never point to an id that isn't on disk
+        if new:
+            with open(self.nodes_path, "a", encoding="utf-8") as file:
+                file.write("".join(f"{alias}\n" for alias in new))
+
+        return ids
+
+    def append(self, nodes: Dict[str, GenericNode], latencies: Optional[Dict[str, float]] = None,
+               ts: Optional[float] = None) -> int:
+        """One snapshot of nodes, invalid ones included, returns the number of rows written"""
+        ts = time.time() if ts is None else ts
+        latencies = latencies or {}
+
+        columns = {
+            "ts": np.full(len(nodes), ts),
+            "node": self.node_ids(nodes.keys()),
+            "buy": [node._buy_price for node in nodes.values()],
+            "sell": [node._sell_price for node in nodes.values()],
+            "latency": [latencies.get(alias, np.nan) for alias in nodes],
+            "valid": [not node.invalid for node in nodes.values()],
+        }
+        for name, values in columns.items():
+            with open(self.column_path(name), "ab") as file:
+                file.write(np.asarray(values, dtype=QUOTE_COLUMNS[name]).tobytes())
+
+        return len(nodes)
+
+    def read(self) -> Dict[str, np.ndarray]:
+        """Every row so far as read-only memory maps per column, rows missing from any column are left out"""
+        count = self._count()
+        if count == 0:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in QUOTE_COLUMNS.items()}
+
+        return {name: np.memmap(self.column_path(name), dtype=dtype, mode="r", shape=(count,))
+                for name, dtype in QUOTE_COLUMNS.items()}
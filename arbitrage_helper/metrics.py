@@ -0,0 +1,153 @@
+from typing import *
+from contextlib import contextmanager
+import threading
+import json
+import time
+import os
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Metrics:
+    """Counters and timing summaries for the scan hot paths, every call returns at once while disabled
+
+    Exported as Prometheus text (summaries as _sum/_count plus a _max gauge) or as JSON lines, one sample per line."""
+
+    TYPES = {
+        "node_parse_seconds": ("summary", "Parse latency per source, whole call for batched classes"),
+        "node_queue_seconds": ("summary", "Time a node waited for a parse worker"),
+        "node_parse_total": ("counter", "Parses per source and outcome, ok / invalid (prices left at class defaults) / error"),
+        "phase_seconds": ("summary", "Wall time per scan phase"),
+        "routes_total": ("counter", "Routes per stage, generated / pruned_rules / pruned_bound / evaluated / profitable"),
+    }
+
+    def __init__(self, enabled: bool = False, prefix: str = "arbitrage"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._summaries: Dict[Tuple[str, Labels], List[float]] = {}  # sum, count, max
+
+    @contextmanager
+    def scope(self, enabled: bool = True) -> Generator[None, None, None]:
+        """Enabled until exit when enabled is set, back to the previous state after"""
+        previous = self.enabled
+        self.enabled = previous or enabled
+        try:
+            yield
+        finally:
+            self.enabled = previous
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._summaries.clear()
+
+    def inc(self, name: str, value: float = 1, **labels: str):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels: str):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if (summary := self._summaries.get(key)) is None:
+                self._summaries[key] = [value, 1, value]
+            else:
+                summary[0] += value
+                summary[1] += 1
+                summary[2] = max(summary[2], value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Generator[None, None, None]:
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def phase(self, name: str):
+        return self.timer("phase_seconds", phase=name)
+
+    def node_parsed(self, source: str, latency: Optional[float], outcome: str, queued: Optional[float] = None):
+        """One node of a parse cycle, labeled by source only so series don't grow with the node count"""
+        if not self.enabled:
+            return
+        if latency is not None:
+            self.observe("node_parse_seconds", latency, source=source)
+        if queued is not None:
+            self.observe("node_queue_seconds", queued, source=source)
+        self.inc("node_parse_total", source=source, outcome=outcome)
+
+    def routes(self, stage: str, count: int):
+        self.inc("routes_total", count, stage=stage)
+
+    def families(self) -> List[Tuple[str, str, str, List[Tuple[str, Dict[str, str], float]]]]:
+        """(family, type, help, samples) sorted by family, a summary's max is a gauge family of its own"""
+        with self._lock:
+            counters = list(self._counters.items())
+            summaries = list(self._summaries.items())
+
+        families: Dict[str, Tuple[str, str, List[Tuple[str, Dict[str, str], float]]]] = {}
+
+        def add(family: str, metric_type: str, description: str, name: str, labels: Labels, value: float):
+            families.setdefault(family, (metric_type, description, []))[2].append((name, dict(labels), value))
+
+        for (name, labels), value in counters:
+            family = f"{self.prefix}_{name}"
+            add(family, *self.TYPES.get(name, ("untyped", "")), family, labels, value)
+        for (name, labels), (total, count, peak) in summaries:
+            family = f"{self.prefix}_{name}"
+            metric_type, description = self.TYPES.get(name, ("summary", ""))
+            add(family, metric_type, description, f"{family}_sum", labels, total)
+            add(family, metric_type, description, f"{family}_count", labels, count)
+            add(f"{family}_max", "gauge", f"Max of {family}", f"{family}_max", labels, peak)
+
+        return [(family, metric_type, description, sorted(samples, key=lambda sample: (sorted(sample[1].items()), sample[0])))
+                for family, (metric_type, description, samples) in sorted(families.items())]
+
+    def samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        """(full name, labels, value) of every series"""
+        return [sample for *_, samples in self.families() for sample in samples]
+
+    def prometheus(self) -> str:
+        lines = []
+        for family, metric_type, description, samples in self.families():
+            lines += [f"# HELP {family} {description}", f"# TYPE {family} {metric_type}"]
+            for name, labels, value in samples:
+                label_text = ",".join(f'{k}="{self._escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        return "\n".join(lines) + "\n"
+
+    def json_lines(self, ts: Optional[float] = None) -> str:
+        ts = time.time() if ts is None else ts
+        return "".join(json.dumps({"ts": ts, "metric": name, "labels": labels, "value": value}) + "\n"
+                       for name, labels, value in self.samples())
+
+    def write(self, path: str):
+        """Prometheus textfile for .prom paths (replaced), JSON lines otherwise (appended)"""
+        if path.endswith(".prom"):
+            # Collectors may read it any time, never leave it half written
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w") as file:
+                file.write(self.prometheus())
+            os.replace(tmp_path, path)
+        else:
+            with open(path, "a") as file:
+                file.write(self.json_lines())
+
+    @staticmethod
+    def _escape(value: str) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+metrics = Metrics()
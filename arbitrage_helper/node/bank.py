@@ -1,7 +1,9 @@
-import requests
-import json
+from typing import *
+import asyncio
 
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
+from arbitrage_helper.node.fetch import AsyncFetcher
 from arbitrage_helper.currency import CEnum
 
 
@@ -11,14 +13,30 @@ class Tinkoff(GenericNode):
         super().__init__(base, quote, trader_mode=False)
 
     def parse(self):
-        r = requests.get(f"https://api.tinkoff.ru/v1/currency_rates?from={str(self.base)}&to={str(self.quote)}")
-        res = json.loads(r.text)
+        res = fetch.get_json(f"https://api.tinkoff.ru/v1/currency_rates?from={str(self.base)}&to={str(self.quote)}")
 
         rate = next(filter(lambda x: x["category"] == "DebitCardsOperations", res["payload"]["rates"]))
 
         self._buy_price = rate["sell"]
         self._sell_price = rate["buy"]
 
+    @classmethod
+    def parse_batch(cls, nodes: List["Tinkoff"]):
+        # Full rates table covers most pairs, the rest are asked for one by one, all of them if the table fails
+        try:
+            res = fetch.get_json("https://api.tinkoff.ru/v1/currency_rates")
+            rates = {(rate["fromCurrency"]["name"], rate["toCurrency"]["name"]): rate
+                     for rate in res["payload"]["rates"] if rate["category"] == "DebitCardsOperations"}
+        except Exception:
+            rates = {}
+
+        for node in nodes:
+            if (rate := rates.get((str(node.base), str(node.quote)))) is not None:
+                node._buy_price = rate["sell"]
+                node._sell_price = rate["buy"]
+            else:
+                node.parse()
+
 
 ################################################################
 class Jusan(GenericNode):
@@ -26,8 +44,7 @@ class Jusan(GenericNode):
         super().__init__(base, quote, trader_mode=False)
 
     def parse(self):
-        r = requests.get(f"https://jusan.kz/banking/v1/currency/exchange")
-        res = json.loads(r.text)
+        res = fetch.get_json("https://jusan.kz/banking/v1/currency/exchange")
 
         for rate in res:
             if rate["currencyFrom"] == str(self.base) and rate["currencyTo"] == str(self.quote):
@@ -42,14 +59,21 @@ class Vexel(GenericNode):
         super().__init__(base, quote, trader_mode=False)
 
     def parse(self):
-        r = requests.post(f"https://vexel.online/api/v2/info",
-                          json={"from": str(self.quote), "to": str(self.base),
-                                "amount": "1", "information": "getExchangeRate"})
-        if data := json.loads(r.text)["data"]:
+        self._apply(buy_res=fetch.post_json("https://vexel.online/api/v2/info", self._rate_body(src=self.quote, dst=self.base)),
+                    sell_res=fetch.post_json("https://vexel.online/api/v2/info", self._rate_body(src=self.base, dst=self.quote)))
+
+    async def parse_async(self, fetcher: AsyncFetcher):
+        buy_res, sell_res = await asyncio.gather(
+            fetcher.post_json("https://vexel.online/api/v2/info", self._rate_body(src=self.quote, dst=self.base)),
+            fetcher.post_json("https://vexel.online/api/v2/info", self._rate_body(src=self.base, dst=self.quote)))
+        self._apply(buy_res=buy_res, sell_res=sell_res)
+
+    def _rate_body(self, src: CEnum, dst: CEnum) -> dict:
+        return {"from": str(src), "to": str(dst), "amount": "1", "information": "getExchangeRate"}
+
+    def _apply(self, buy_res: dict, sell_res: dict):
+        if data := buy_res["data"]:
             self._buy_price = 1/float(data["rate"])
 
-        r = requests.post(f"https://vexel.online/api/v2/info",
-                          json={"from": str(self.base), "to": str(self.quote),
-                                "amount": "1", "information": "getExchangeRate"})
-        if data := json.loads(r.text)["data"]:
+        if data := sell_res["data"]:
             self._sell_price = float(data["rate"])
@@ -0,0 +1,82 @@
+from typing import *
+
+import numpy as np
+
+
+class Depth:
+    """One side of an order book as cumulative volume arrays, best level first
+
+    cum_base[i] / cum_quote[i] - base and quote volume of levels before i, so a fill is one binary search.
+    Amounts past the last known level can't be filled and come out as nan."""
+
+    def __init__(self, prices: Sequence[float], volumes: Sequence[float]):
+        self.prices = np.asarray(prices, dtype=np.float64)
+        volumes = np.asarray(volumes, dtype=np.float64)
+
+        self.cum_base = np.concatenate([[0.0], np.cumsum(volumes)])
+        self.cum_quote = np.concatenate([[0.0], np.cumsum(volumes * self.prices)])
+
+    @classmethod
+    def from_levels(cls, levels: Iterable[Tuple[float, float]]) -> Optional["Depth"]:
+        """(price, base volume) pairs, None when there's nothing to build from"""
+        levels = [(float(price), float(volume)) for price, volume in levels if float(volume) > 0]
+        if not levels:
+            return None
+        prices, volumes = zip(*levels)
+        return cls(prices=prices, volumes=volumes)
+
+    def __len__(self):
+        return len(self.prices)
+
+    @property
+    def best_price(self) -> float:
+        return float(self.prices[0])
+
+    @staticmethod
+    def _walk(amount, cum_in: np.ndarray, cum_out: np.ndarray, rates: np.ndarray):
+        level = np.clip(np.searchsorted(cum_in, amount, side="left") - 1, 0, len(rates) - 1)
+        out = np.where(amount <= cum_in[-1], cum_out[level] + (amount - cum_in[level]) * rates[level], np.nan)
+        return out if isinstance(out, np.ndarray) and out.ndim else float(out)
+
+    def sell(self, amount):
+        """Base amount (scalar or array) sold into the bids -> quote received"""
+        return self._walk(amount, cum_in=self.cum_base, cum_out=self.cum_quote, rates=self.prices)
+
+    def buy(self, amount):
+        """Quote amount (scalar or array) spent on the asks -> base received"""
+        return self._walk(amount, cum_in=self.cum_quote, cum_out=self.cum_base, rates=1 / self.prices)
+
+
+class AdBook(Depth):
+    """P2P ads, best price first, a fill goes whole to one ad and has to fit its quote limits
+
+    Ads can't be combined, so an amount gets the best price among the ads accepting it, nan when none does."""
+
+    def __init__(self, prices: Sequence[float], volumes: Sequence[float], min_quote: Sequence[float], max_quote: Sequence[float]):
+        super().__init__(prices=prices, volumes=volumes)
+        self.min_quote = np.asarray(min_quote, dtype=np.float64)
+        self.max_quote = np.minimum(np.asarray(max_quote, dtype=np.float64), np.diff(self.cum_quote))
+
+    @classmethod
+    def from_ads(cls, ads: Iterable[Tuple[float, float, float, float]]) -> Optional["AdBook"]:
+        """(price, base volume, min quote, max quote) per ad, None when there's nothing to build from"""
+        ads = [tuple(map(float, ad)) for ad in ads if float(ad[1]) > 0]
+        if not ads:
+            return None
+        prices, volumes, min_quote, max_quote = zip(*ads)
+        return cls(prices=prices, volumes=volumes, min_quote=min_quote, max_quote=max_quote)
+
+    def _best(self, quote: np.ndarray, out: np.ndarray):
+        """Best out over the ads whose limits hold quote, last axis is the ad"""
+        accepted = (self.min_quote <= quote) & (quote <= self.max_quote)
+        best = np.max(np.where(accepted, out, -np.inf), axis=-1)
+        best = np.where(np.isfinite(best), best, np.nan)
+        return best if best.ndim else float(best)
+
+    def sell(self, amount):
+        quote = np.asarray(amount, dtype=np.float64)[..., None] * self.prices
+        return self._best(quote=quote, out=quote)
+
+    def buy(self, amount):
+        quote = np.asarray(amount, dtype=np.float64)[..., None]
+        return self._best(quote=quote, out=quote / self.prices)
@@ -1,21 +1,53 @@
+from typing import *
 import json
 
-import requests
-
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
+from arbitrage_helper.node.fetch import AsyncFetcher
 from arbitrage_helper.currency import *
 
 
+BOOK_TICKER_URL = "https://api.binance.com/api/v3/ticker/bookTicker"
+
+
+def parse_book_tickers(content: bytes) -> Dict[str, Tuple[float, float]]:
+    """Symbol -> (ask, bid) for every spot symbol"""
+    return {ticker["symbol"]: (float(ticker["askPrice"]), float(ticker["bidPrice"])) for ticker in json.loads(content)}
+
+
 class BinanceExchange(GenericNode):
     def __init__(self, base: CEnum, quote: CEnum, trader_mode: bool = False):
         super().__init__(base, quote, trader_mode=trader_mode)
 
+    @property
+    def symbol(self) -> str:
+        return f"{str(self.base)}{str(self.quote)}"
+
     def parse(self):
-        r = requests.get(f"https://api.binance.com/api/v3/ticker/bookTicker?symbol={str(self.base)}{str(self.quote)}")
-        data = json.loads(r.text)
+        # The whole book ticker pays off only when the other nodes of the cycle share it
+        if fetch.caching():
+            self.parse_batch([self])
+            return
 
+        data = fetch.get_json(f"{BOOK_TICKER_URL}?symbol={self.symbol}")
         try:
             self._buy_price = float(data["askPrice"])
             self._sell_price = float(data["bidPrice"])
         except KeyError:
             pass
+
+    @classmethod
+    def parse_batch(cls, nodes: List["BinanceExchange"]):
+        # Whole book ticker in one request, fanned out to every node
+        cls._apply_tickers(nodes, fetch.fetch("GET", BOOK_TICKER_URL, parser=parse_book_tickers))
+
+    @classmethod
+    async def parse_batch_async(cls, nodes: List["BinanceExchange"], fetcher: AsyncFetcher):
+        cls._apply_tickers(nodes, await fetcher.fetch("GET", BOOK_TICKER_URL, parser=parse_book_tickers))
+
+    @staticmethod
+    def _apply_tickers(nodes: List["BinanceExchange"], tickers: Dict[str, Tuple[float, float]]):
+        # Nonexistent pairs stay unparsed
+        for node in nodes:
+            if (ticker := tickers.get(node.symbol)) is not None:
+                node._buy_price, node._sell_price = ticker
@@ -1,8 +1,7 @@
-import json
-
-import requests
-
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
+from arbitrage_helper.node.fetch import AsyncFetcher
+from arbitrage_helper.node.depth import Depth
 from arbitrage_helper.currency import *
 
 
@@ -10,12 +9,21 @@ class CryptologyExchange(GenericNode):
     def __init__(self, base: CEnum, quote: CEnum, trader_mode: bool = False):
         super().__init__(base, quote, trader_mode=trader_mode)
 
+    @property
+    def url(self) -> str:
+        return f"https://api.cryptology.com/v1/public/get-order-book?trade_pair={str(self.base)}_{str(self.quote)}"
+
     def parse(self):
-        r = requests.get(f"https://api.cryptology.com/v1/public/get-order-book?trade_pair={str(self.base)}_{str(self.quote)}")
-        data = json.loads(r.text)
+        self._apply(fetch.get_json(self.url))
+
+    async def parse_async(self, fetcher: AsyncFetcher):
+        self._apply(await fetcher.get_json(self.url))
 
+    def _apply(self, data: dict):
         if data := data["data"]:
             self._buy_price = float(data["asks"][0][0])
             self._sell_price = float(data["bids"][0][0])
+            self._asks = Depth.from_levels((level[0], level[1]) for level in data["asks"])
+            self._bids = Depth.from_levels((level[0], level[1]) for level in data["bids"])
         else:
             pass
@@ -1,8 +1,7 @@
-import json
-
-import requests
-
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
+from arbitrage_helper.node.fetch import AsyncFetcher
+from arbitrage_helper.node.depth import Depth
 from arbitrage_helper.currency import *
 
 
@@ -10,11 +9,20 @@ class GarantexExchange(GenericNode):
     def __init__(self, base: CEnum, quote: CEnum, trader_mode: bool = False):
         super().__init__(base, quote, trader_mode=trader_mode)
 
-    def parse(self):
+    @property
+    def url(self) -> str:
         pair = f"{self.base}{self.quote}".lower()
-        r = requests.get(f"https://garantex.io/api/v2/depth?market={pair}")
-        data = json.loads(r.text)
+        return f"https://garantex.io/api/v2/depth?market={pair}"
+
+    def parse(self):
+        self._apply(fetch.get_json(self.url))
+
+    async def parse_async(self, fetcher: AsyncFetcher):
+        self._apply(await fetcher.get_json(self.url))
 
+    def _apply(self, data: dict):
         if data.get("error") is None:
             self._buy_price = float(data["asks"][0]["price"])
             self._sell_price = float(data["bids"][0]["price"])
+            self._asks = Depth.from_levels((level["price"], level["volume"]) for level in data["asks"])
+            self._bids = Depth.from_levels((level["price"], level["volume"]) for level in data["bids"])
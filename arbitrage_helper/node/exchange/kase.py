@@ -1,8 +1,5 @@
-from urllib.request import urlopen
-
-from lxml import etree
-
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
 from arbitrage_helper.currency import *
 
 
@@ -37,8 +34,7 @@ class KASE(GenericNode):
         return xpath
 
     def parse(self):
-        r = urlopen("https://kase.kz/en/currency/")
-        tree = etree.parse(r, etree.HTMLParser())
+        tree = fetch.get_tree("https://kase.kz/en/currency/")
 
         buy_elems = tree.xpath(self._table_bid_xpath(security=self.security)) + \
                     tree.xpath(self._circle_xpath(security=self.security))
@@ -1,8 +1,5 @@
-import json
-
-import requests
-
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
 from arbitrage_helper.currency import *
 
 
@@ -12,8 +9,7 @@ class MOEX(GenericNode):
         self.security = security
 
     def parse(self):
-        r = requests.get(f"https://iss.moex.com/cs/engines/currency/markets/selt/boardgroups/13/securities/{self.security}.hs?s1.type=candles&interval=24&candles=2")
-        data = json.loads(r.text)
+        data = fetch.get_json(f"https://iss.moex.com/cs/engines/currency/markets/selt/boardgroups/13/securities/{self.security}.hs?s1.type=candles&interval=24&candles=2")
 
         if data := data["candles"][0]["data"]:
             self._buy_price = data[-1][4]  # TS, OHLC
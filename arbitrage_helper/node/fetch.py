@@ -0,0 +1,349 @@
+from typing import *
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+import importlib.util
+import ssl
+import threading
+import asyncio
+import json
+import time
+import io
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3 import PoolManager
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.connection import HTTPConnection, HTTPSConnection
+import certifi
+from lxml import etree
+
+try:
+    import httpx
+except ImportError:  # async extra not installed
+    httpx = None
+
+
+def parse_json(content: bytes) -> Any:
+    return json.loads(content)
+
+
+def parse_html(content: bytes) -> etree._ElementTree:
+    return etree.parse(io.BytesIO(content), etree.HTMLParser())
+
+
+class ResponseCache:
+    """Parsed responses of one parse cycle, concurrent callers of the same request wait on one fetch"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[Hashable, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        with self._lock:
+            if (future := self._entries.get(key)) is None:
+                future = self._entries[key] = Future()
+                owner = True
+                self.misses += 1
+            else:
+                owner = False
+                self.hits += 1
+
+        if owner:
+            try:
+                future.set_result(load())
+            except BaseException as e:
+                future.set_exception(e)
+
+        return future.result()
+
+
+################################################################
+class HostStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self.connect_time = 0.0
+
+    def add_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def add_connection(self, elapsed: float):
+        with self._lock:
+            self.connections += 1
+            self.connect_time += elapsed
+
+    @property
+    def hit_rate(self) -> float:
+        """Share of requests served on an already open connection"""
+        return 1 - self.connections / self.requests if self.requests else 0.0
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.connections = 0
+            self.connect_time = 0.0
+
+    def __repr__(self) -> str:
+        avg = self.connect_time / self.connections * 1000 if self.connections else 0.0
+        return f"{self.requests} requests, {self.connections} connects ({avg:.1f}ms avg), {self.hit_rate:.0%} pool hits"
+
+
+class _TimedPoolManager(PoolManager):
+    """Pool manager whose connections report their connect time to stats"""
+
+    def __init__(self, stats: HostStats, **kwargs):
+        super().__init__(**kwargs)
+
+        def timed(connection_cls):
+            class TimedConnection(connection_cls):
+                def connect(self):
+                    start = time.perf_counter()
+                    super().connect()
+                    stats.add_connection(time.perf_counter() - start)
+            return TimedConnection
+
+        self.pool_classes_by_scheme = {
+            "http": type("TimedHTTPConnectionPool", (HTTPConnectionPool,), {"ConnectionCls": timed(HTTPConnection)}),
+            "https": type("TimedHTTPSConnectionPool", (HTTPSConnectionPool,), {"ConnectionCls": timed(HTTPSConnection)}),
+        }
+
+
+class _PooledAdapter(HTTPAdapter):
+    """Keep-alive pool that reports new connections and their connect time to stats"""
+
+    def __init__(self, stats: HostStats, pool_size: int):
+        self._stats = stats
+        super().__init__(pool_connections=1, pool_maxsize=pool_size)
+
+    def init_poolmanager(self, connections: int, maxsize: int, block: bool = False, **pool_kwargs):
+        """Same as HTTPAdapter, with the timed pool manager"""
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
+        self.poolmanager = _TimedPoolManager(stats=self._stats, num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+
+
+class _ConnectTrace:
+    """httpx trace extension of one request, reports a new connection like _PooledAdapter does
+
+    httpcore only emits connect events when it opens a connection, a pooled one goes straight to the request."""
+
+    def __init__(self, stats: HostStats, tls: bool):
+        self._stats = stats
+        self._done = "connection.start_tls.complete" if tls else "connection.connect_tcp.complete"
+        self._started: Optional[float] = None
+
+    async def __call__(self, event: str, info: dict):
+        if event == "connection.connect_tcp.started":
+            self._started = time.perf_counter()
+        elif event == self._done and self._started is not None:
+            self._stats.add_connection(time.perf_counter() - self._started)
+            self._started = None
+
+
+class SessionRegistry:
+    """One keep-alive session per source host, shared by every node
+
+    Async clients are bound to their event loop, so AsyncFetcher owns them, but they are built here
+    with the same per-host pool sizes and report to the same HostStats."""
+
+    def __init__(self, pool_size: int = 10, pool_sizes: Optional[Dict[str, int]] = None):
+        self.pool_size = pool_size
+        self.pool_sizes = pool_sizes or {}
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, requests.Session] = {}
+        self._stats: Dict[str, HostStats] = {}
+
+    def host_pool_size(self, host: str) -> int:
+        return self.pool_sizes.get(host, self.pool_size)
+
+    def host_stats(self, host: str) -> HostStats:
+        with self._lock:
+            return self._stats.setdefault(host, HostStats())
+
+    def session(self, host: str) -> requests.Session:
+        with self._lock:
+            if (session := self._sessions.get(host)) is None:
+                stats = self._stats.setdefault(host, HostStats())
+                adapter = _PooledAdapter(stats=stats, pool_size=self.host_pool_size(host))
+
+                session = self._sessions[host] = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+
+            return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Stats and pool are keyed by the source host, before any redirect"""
+        host = urlsplit(url).netloc
+        session = self.session(host)
+        self._stats[host].add_request()
+        return session.request(method, redirect(url), **kwargs)
+
+    def async_client(self, host: str, pool_size: Optional[int] = None, **kwargs) -> "httpx.AsyncClient":
+        """New client for host, pool sized like its session unless pool_size is given, closing it is up to the caller"""
+        pool_size = pool_size or self.host_pool_size(host)
+        stats = self.host_stats(host)
+
+        async def on_request(request: "httpx.Request"):
+            stats.add_request()
+            request.extensions["trace"] = _ConnectTrace(stats=stats, tls=request.url.scheme == "https")
+
+        return httpx.AsyncClient(limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                                 event_hooks={"request": [on_request]}, **kwargs)
+
+    def stats(self) -> Dict[str, HostStats]:
+        return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            for stats in self._stats.values():
+                stats.reset()
+
+    def report(self) -> str:
+        return "\n".join(f"{host}: {stats}" for host, stats in sorted(self._stats.items()) if stats.requests)
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+# P2P sees the most parallel requests
+sessions = SessionRegistry(pool_size=10, pool_sizes={"p2p.binance.com": 25})
+
+# Per context, so overlapping parse cycles in different threads keep their own caches,
+# threads a cycle fans out to must run in a copy of its context (asyncio tasks and to_thread do)
+_cache: ContextVar[Optional[ResponseCache]] = ContextVar("response_cache", default=None)
+_redirects: Dict[str, str] = {}
+
+
+@contextmanager
+def response_cache() -> Generator[ResponseCache, None, None]:
+    """Share responses between nodes until exit, meant to wrap one parse cycle"""
+    cache = ResponseCache()
+    token = _cache.set(cache)
+    try:
+        yield cache
+    finally:
+        _cache.reset(token)
+
+
+def caching() -> bool:
+    """Whether this context runs inside response_cache()"""
+    return _cache.get() is not None
+
+
+@contextmanager
+def redirected(origins: Dict[str, str]) -> Generator[None, None, None]:
+    """Send requests for the origins elsewhere until exit, e.g. to a local stub server"""
+    previous = dict(_redirects)
+    _redirects.update(origins)
+    try:
+        yield
+    finally:
+        _redirects.clear()
+        _redirects.update(previous)
+
+
+def redirect(url: str) -> str:
+    for origin, target in _redirects.items():
+        if url.startswith(origin):
+            return target + url[len(origin):]
+    return url
+
+
+def fetch(method: str, url: str, body: Any = None, parser: Callable[[bytes], Any] = parse_json) -> Any:
+    """Request url and parse the response, coalesced by method+url+body+parser inside response_cache()"""
+    def load():
+        r = sessions.request(method, url, json=body)
+        return parser(r.content)
+
+    if (cache := _cache.get()) is None:
+        return load()
+
+    key = (method, url, json.dumps(body, sort_keys=True), parser)
+    return cache.get(key, load)
+
+
+def get_json(url: str) -> Any:
+    return fetch("GET", url)
+
+
+def post_json(url: str, body: Any) -> Any:
+    return fetch("POST", url, body=body)
+
+
+def get_tree(url: str) -> etree._ElementTree:
+    return fetch("GET", url, parser=parse_html)
+
+
+################################################################
+class AsyncFetcher:
+    """Async counterpart of fetch() for one parse cycle
+
+    Keep-alive clients (HTTP/2 when h2 is installed) shared by every node, one per host so that a
+    busy host doesn't slow down pool bookkeeping for the others. Clients come from the session registry,
+    sized per_host (concurrency by default) instead of its thread pool sizes. Requests are coalesced
+    like in response_cache() and limited to concurrency in flight overall."""
+
+    def __init__(self, concurrency: int = 50, per_host: Optional[int] = None, timeout: float = 10.0,
+                 registry: Optional[SessionRegistry] = None):
+        if httpx is None:
+            raise ImportError("Async parsing needs httpx, install with the async extra")
+
+        self._http2 = importlib.util.find_spec("h2") is not None
+        self._per_host = per_host or concurrency  # Thread pool sizes of the registry would cap one busy host below concurrency
+        self._registry = registry or sessions
+        self._ssl = ssl.create_default_context(cafile=certifi.where())
+        self._timeout = timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    def _client(self, url: str) -> httpx.AsyncClient:
+        """Keyed by the source host, before any redirect, pool size and stats come from the registry"""
+        host = urlsplit(url).netloc
+        if (client := self._clients.get(host)) is None:
+            client = self._clients[host] = self._registry.async_client(host, pool_size=self._per_host, http2=self._http2,
+                                                                       timeout=self._timeout, verify=self._ssl)
+        return client
+
+    async def fetch(self, method: str, url: str, body: Any = None, parser: Callable[[bytes], Any] = parse_json) -> Any:
+        key = (method, url, json.dumps(body, sort_keys=True), parser)
+        if (task := self._tasks.get(key)) is None:
+            task = self._tasks[key] = asyncio.ensure_future(self._load(method=method, url=url, body=body, parser=parser))
+
+        return await task
+
+    async def _load(self, method: str, url: str, body: Any, parser: Callable[[bytes], Any]) -> Any:
+        async with self._semaphore:
+            r = await self._client(url).request(method, redirect(url), json=body)
+        return parser(r.content)
+
+    async def get_json(self, url: str) -> Any:
+        return await self.fetch("GET", url)
+
+    async def post_json(self, url: str, body: Any) -> Any:
+        return await self.fetch("POST", url, body=body)
+
+    async def get_tree(self, url: str) -> etree._ElementTree:
+        return await self.fetch("GET", url, parser=parse_html)
@@ -1,16 +1,21 @@
 from typing import *
+import asyncio
 
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
 from decouple import config
 
 from arbitrage_helper.balance import Balance
+from arbitrage_helper.node.fetch import AsyncFetcher
+from arbitrage_helper.node.depth import Depth
 from arbitrage_helper.currency import *
 
 
 class GenericNode:
     _buy_price = 9223372036854775807  # I buy, someone sells to me, min price - 40000, ask
     _sell_price = 0  # I sell, someone buys from me, max price - 39000, bid
+    _asks: Optional[Depth] = None  # Full book when the source gives it, exchange walks it instead of the top price
+    _bids: Optional[Depth] = None
 
     def __init__(self, base: CEnum, quote: CEnum, trader_mode: bool = False):
         self.trader_mode = trader_mode
@@ -30,6 +35,30 @@ class GenericNode:
     def parse(self):
         raise NotImplementedError
 
+    @classmethod
+    def parse_batch(cls, nodes: List["GenericNode"]):
+        """Parse all nodes of the class at once, override for sources serving many pairs in one response"""
+        for node in nodes:
+            node.parse()
+
+    @classmethod
+    def batched(cls) -> bool:
+        return cls.parse_batch.__func__ is not GenericNode.parse_batch.__func__
+
+    async def parse_async(self, fetcher: AsyncFetcher):
+        """Blocking parse() in a worker thread, override with a native coroutine"""
+        await asyncio.to_thread(self.parse)
+
+    @classmethod
+    async def parse_batch_async(cls, nodes: List["GenericNode"], fetcher: AsyncFetcher):
+        if cls.batched():
+            await asyncio.to_thread(cls.parse_batch, nodes)
+        else:
+            # Every node gets its chance, the first failure is raised as parse_batch would
+            results = await asyncio.gather(*[node.parse_async(fetcher) for node in nodes], return_exceptions=True)
+            if (error := next((r for r in results if isinstance(r, Exception)), None)) is not None:
+                raise error
+
     @property
     def invalid(self):
         return self._buy_price == self.__class__._buy_price and self._sell_price == self.__class__._sell_price or self._buy_price == 0.0
@@ -52,6 +81,11 @@ class GenericNode:
     def repr(self):
         return f"{self.__class__.__name__} {self.base.repr}/{self.quote.repr}"
 
+    @classmethod
+    def source(cls) -> str:
+        """Venue class right below GenericNode, per-pair subclasses like KASE_EURKZT report KASE"""
+        return next(c for c in reversed(cls.__mro__) if issubclass(c, GenericNode) and c is not GenericNode).__name__
+
     @property
     def base(self) -> CEnum:
         return self._base
@@ -63,11 +97,32 @@ class GenericNode:
     def exchange(self, balance: Balance) -> Balance:
         assert balance.currency == self.base or balance.currency == self.quote, "Wrong currency"
 
+        # Limit orders in trader mode, no book to walk
         if balance.currency == self.base:
+            if self._bids is not None and not self.trader_mode:
+                return Balance(self._bids.sell(balance.value), currency=self.quote)
             return Balance(balance.value * self.sell_price, currency=self.quote)
         elif balance.currency == self.quote:
+            if self._asks is not None and not self.trader_mode:
+                return Balance(self._asks.buy(balance.value), currency=self.base)
             return Balance(balance.value / self.buy_price, currency=self.base)
 
+    @property
+    def asks(self) -> Optional[Depth]:
+        return self._asks
+
+    @property
+    def bids(self) -> Optional[Depth]:
+        return self._bids
+
+    def rate(self, currency: CEnum) -> float:
+        """Multiplicative rate when converting from currency, 0.0 when there's no positive price to convert at"""
+        if currency == self.base:
+            return max(self.sell_price, 0.0)
+        elif currency == self.quote:
+            return 1 / self.buy_price if self.buy_price > 0 else 0.0
+        raise ValueError(f"{self.repr} doesn't convert {currency.repr}")
+
     def currency_convert(self, currency: CEnum) -> Optional[CEnum]:
         if currency == self.quote:
             return self.base
@@ -1,9 +1,12 @@
 from typing import *
-import requests
-import json
 from enum import Enum
+import math
+import asyncio
 
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
+from arbitrage_helper.node.fetch import AsyncFetcher
+from arbitrage_helper.node.depth import AdBook
 from arbitrage_helper.currency import *
 
 
@@ -24,6 +27,9 @@ class BPM(Enum):  # Binance Payment Method
 
 
 class BinanceP2P(GenericNode):
+    SEARCH_URL = "https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search"
+    ROWS = 20  # Search page size, max allowed
+
     def __init__(self, base: CEnum, quote: CEnum, payment_method: Union[BPM, Iterable[BPM]],
                  trader_mode: bool = False, merchant_check: bool = False):
         super().__init__(base, quote, trader_mode)
@@ -38,52 +44,70 @@ class BinanceP2P(GenericNode):
         return f"BinanceP2P {','.join(map(str, self.payment_method))} {self.base.repr}/{self.quote.repr}"
 
     def parse(self):
-        self._buy_price = self._parse_buy_price(base=self.base, quote=self.quote)
-        self._sell_price = self._parse_sell_price(base=self.base, quote=self.quote)
+        self._apply(buy_ads=self._parse_ads(trade_type="BUY"), sell_ads=self._parse_ads(trade_type="SELL"))
 
-    def _parse_price(self, json_data) -> Optional[float]:
-        r = requests.post('https://p2p.binance.com/bapi/c2c/v2/friendly/c2c/adv/search', json=json_data)
-        if len((res := json.loads(r.text))["data"]) > 0:
-            return float(res["data"][0]["adv"]["price"])
-        else:
-            return None
+    async def parse_async(self, fetcher: AsyncFetcher):
+        buy_ads, sell_ads = await asyncio.gather(self._parse_ads_async(fetcher=fetcher, trade_type="BUY"),
+                                                 self._parse_ads_async(fetcher=fetcher, trade_type="SELL"))
+        self._apply(buy_ads=buy_ads, sell_ads=sell_ads)
 
-    def _parse_buy_price(self, base: CEnum, quote: CEnum):
-        json_data = {
-            "asset": str(base),
-            "fiat": str(quote),
-            "page": 1,
-            "payTypes": [],
-            "publisherType": None,
-            "rows": 3,
-            "tradeType": "BUY"
-        }
-        if self.payment_method != BPM.All:
-            json_data["payTypes"] = [m.value for m in self.payment_method]
-        if self.merchant_check:
-            json_data["publisherType"] = "merchant"
+    def _apply(self, buy_ads: List[dict], sell_ads: List[dict]):
+        if buy_ads:
+            self._buy_price = float(buy_ads[0]["adv"]["price"])
+            self._asks = self._depth(buy_ads)
+        if sell_ads:
+            self._sell_price = float(sell_ads[0]["adv"]["price"])
+            self._bids = self._depth(sell_ads)
 
-        if (res := self._parse_price(json_data)) is None:
-            return self.buy_price
-        else:
-            return res
+    @staticmethod
+    def _depth(ads: List[dict]) -> Optional[AdBook]:
+        """Tradable quantity is in the asset, single trade limits in the fiat"""
+        return AdBook.from_ads((ad["adv"]["price"], ad["adv"].get("tradableQuantity") or 0,
+                                ad["adv"].get("minSingleTransAmount") or 0, ad["adv"].get("maxSingleTransAmount") or math.inf)
+                               for ad in ads)
+
+    def _parse_ads(self, trade_type: str) -> List[dict]:
+        # One page per asset/fiat/side shared by every payment method inside a parse cycle
+        ads = self._filter_ads(self._search(trade_type=trade_type, pay_types=[]))
 
-    def _parse_sell_price(self, base: CEnum, quote: CEnum):
+        # Payment method didn't make it to the shared page, ask for it explicitly
+        if not ads and BPM.All not in self.payment_method:
+            ads = self._search(trade_type=trade_type, pay_types=[m.value for m in self.payment_method])
+
+        return ads
+
+    async def _parse_ads_async(self, fetcher: AsyncFetcher, trade_type: str) -> List[dict]:
+        res = await fetcher.post_json(self.SEARCH_URL, self._search_body(trade_type=trade_type, pay_types=[]))
+        ads = self._filter_ads(res["data"] or [])
+
+        if not ads and BPM.All not in self.payment_method:
+            res = await fetcher.post_json(self.SEARCH_URL, self._search_body(trade_type=trade_type, pay_types=[m.value for m in self.payment_method]))
+            ads = res["data"] or []
+
+        return ads
+
+    def _search(self, trade_type: str, pay_types: List[str]) -> List[dict]:
+        return fetch.post_json(self.SEARCH_URL, self._search_body(trade_type=trade_type, pay_types=pay_types))["data"] or []
+
+    def _search_body(self, trade_type: str, pay_types: List[str]) -> dict:
         json_data = {
-            "asset": str(base),
-            "fiat": str(quote),
+            "asset": str(self.base),
+            "fiat": str(self.quote),
             "page": 1,
-            "payTypes": [],
+            "payTypes": pay_types,
             "publisherType": None,
-            "rows": 3,
-            "tradeType": "SELL"
+            "rows": self.ROWS,
+            "tradeType": trade_type
         }
-        if self.payment_method != BPM.All:
-            json_data["payTypes"] = [m.value for m in self.payment_method]
         if self.merchant_check:
             json_data["publisherType"] = "merchant"
 
-        if (res := self._parse_price(json_data)) is None:
-            return self.sell_price
-        else:
-            return res
+        return json_data
+
+    def _filter_ads(self, ads: List[dict]) -> List[dict]:
+        """Ads accepting any of the node payment methods, best price first"""
+        if BPM.All in self.payment_method:
+            return ads
+
+        methods = {m.value for m in self.payment_method}
+        return [ad for ad in ads if any(t["identifier"] in methods for t in ad["adv"]["tradeMethods"])]
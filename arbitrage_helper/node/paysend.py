@@ -1,9 +1,5 @@
-from urllib.request import urlopen
-import time
-
-from lxml import etree
-
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
 from arbitrage_helper.currency import *
 
 
@@ -15,8 +11,7 @@ class GenericPaysend(GenericNode):
         self.quote_first = quote_first
 
     def parse(self):
-        r = urlopen(self.link)
-        tree = etree.parse(r, etree.HTMLParser())
+        tree = fetch.get_tree(self.link)
         sell_text = tree.xpath("/html[1]/body[1]/div[1]/div[3]/div[1]/div[1]/div[1]/div[1]/div[2]/div[1]/div[1]/div[1]/div[2]/div[1]/span[1]") + tree.xpath("/html[1]/body[1]/div[1]/div[4]/div[1]/div[1]/div[1]/div[1]/div[2]/div[1]/div[1]/div[1]/div[2]/div[1]/span[1]")
         sell_text = sell_text[0].text
 
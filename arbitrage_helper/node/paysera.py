@@ -1,8 +1,7 @@
 from typing import *
-import requests
-import json
 
 from arbitrage_helper.node.generic import GenericNode
+from arbitrage_helper.node import fetch
 from arbitrage_helper.currency import *
 
 
@@ -21,11 +20,11 @@ class Paysera(GenericNode):
         pass
 
     def _parse_buy_price(self):
-        r = requests.get(f"https://bank.paysera.com/lt/currency-exchange/rest/convert?clientType=natural&to_amount={self.base_amount}&from_currency[]={str(self.quote)}&providers[]=commercial&to_currency[]={str(self.base)}")
-        from_amount = float(json.loads(r.text)["rates"][0]["from_amount"])
+        res = fetch.get_json(f"https://bank.paysera.com/lt/currency-exchange/rest/convert?clientType=natural&to_amount={self.base_amount}&from_currency[]={str(self.quote)}&providers[]=commercial&to_currency[]={str(self.base)}")
+        from_amount = float(res["rates"][0]["from_amount"])
         return round(from_amount / self.base_amount, 8)
 
     def _parse_sell_price(self):
-        r = requests.get(f"https://bank.paysera.com/lt/currency-exchange/rest/convert?clientType=natural&from_amount={self.base_amount}&from_currency[]={str(self.base)}&providers[]=commercial&to_currency[]={str(self.quote)}")
-        to_amount = float(json.loads(r.text)["rates"][0]["to_amount"])
+        res = fetch.get_json(f"https://bank.paysera.com/lt/currency-exchange/rest/convert?clientType=natural&from_amount={self.base_amount}&from_currency[]={str(self.base)}&providers[]=commercial&to_currency[]={str(self.quote)}")
+        to_amount = float(res["rates"][0]["to_amount"])
         return round(to_amount / self.base_amount, 8)
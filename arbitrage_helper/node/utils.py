@@ -44,6 +44,9 @@ class PercFee(GenericNode):
     def exchange(self, balance: Balance) -> Balance:
         return Balance(balance.value * (100 - self.fee_perc) / 100, currency=balance.currency)
 
+    def rate(self, currency: CEnum) -> float:
+        return (100 - self.fee_perc) / 100
+
 
 class FixedFee(GenericNode):
     def __init__(self, currency: CEnum, fee_value: float = 0.0, name: str = "FixedFee"):
@@ -64,3 +67,7 @@ class FixedFee(GenericNode):
 
     def exchange(self, balance: Balance) -> Balance:
         return Balance(balance.value - self.fee_value, currency=balance.currency)
+
+    def rate(self, currency: CEnum) -> float:
+        """Fixed part doesn't scale, so the rate is optimistic"""
+        return 1.0
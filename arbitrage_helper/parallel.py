@@ -0,0 +1,221 @@
+from typing import *
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import heapq
+import os
+
+import numpy as np
+
+from arbitrage_helper.node import *
+from arbitrage_helper.node.depth import Depth
+from arbitrage_helper.route import Route, LoopRules
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.evaluator import RouteEvaluator
+from arbitrage_helper.currency import *
+
+
+class CompactGraph(NamedTuple):
+    """Picklable node graph with prices, node i converts between currency ids base[i] and quote[i]"""
+    base: List[int]
+    quote: List[int]
+    buy: List[float]
+    sell: List[float]
+    fee: List[float]
+    adjacency: Dict[int, List[int]]
+    asks: Dict[int, Depth]  # Nodes with book depth, as in RouteEvaluator
+    bids: Dict[int, Depth]
+
+
+class Search(NamedTuple):
+    """Everything shards of one run share, sent once per worker process"""
+    graph: CompactGraph
+    bounds: List[Dict[int, float]]
+    start: int
+    rules: LoopRules
+    start_value: float
+    threshold: float
+    top_k: Optional[int]
+
+
+class Shard(NamedTuple):
+    size: int
+    prefix: Tuple[int, ...]
+
+
+_search: Optional[Search] = None  # Set in each worker by the pool initializer
+
+
+def _init_worker(search: Search):
+    global _search
+    _search = search
+
+
+def _convert(graph: CompactGraph, i: int, currency: int, value: float) -> Tuple[int, float]:
+    """Same operations as RouteEvaluator, base -> quote sells, quote -> base buys"""
+    if currency == graph.base[i] or currency != graph.quote[i]:
+        if (depth := graph.bids.get(i)) is not None:
+            return graph.quote[i], depth.sell(value) - graph.fee[i]
+        return graph.quote[i], value * graph.sell[i] - graph.fee[i]
+    else:
+        if (depth := graph.asks.get(i)) is not None:
+            return graph.base[i], depth.buy(value) - graph.fee[i]
+        return graph.base[i], value / graph.buy[i] - graph.fee[i]
+
+
+def _next(graph: CompactGraph, i: int, currency: int) -> int:
+    return graph.quote[i] if currency == graph.base[i] or currency != graph.quote[i] else graph.base[i]
+
+
+def _rate(graph: CompactGraph, i: int, currency: int) -> float:
+    if currency == graph.base[i] or currency != graph.quote[i]:
+        return graph.sell[i]
+    else:
+        return 1 / graph.buy[i]
+
+
+def rate_bounds(graph: CompactGraph, start: int, max_hops: int) -> List[Dict[int, float]]:
+    """bounds[k][c] - best multiplicative return from c back to start in exactly k hops"""
+    bounds = [{start: 1.0}]
+    for _ in range(max_hops):
+        previous = bounds[-1]
+        bound = {}
+        for c, nodes in graph.adjacency.items():
+            best = max((_rate(graph, i, c) * previous.get(_next(graph, i, c), 0.0) for i in nodes), default=0.0)
+            if best > 0:
+                bound[c] = best
+        bounds.append(bound)
+
+    return bounds
+
+
+def _allows(graph: CompactGraph, rules: LoopRules, path: List[int], i: int, currency: int, start: int, last: bool) -> bool:
+    if rules.no_reversal and path and path[-1] == i:
+        return False
+    if rules.no_repeat and i in path:
+        return False
+    if rules.no_start_revisit and not last and graph.base[i] != graph.quote[i] and _next(graph, i, currency) == start:
+        return False
+    return True
+
+
+def enumerate_shard(shard: Shard, search: Optional[Search] = None) -> Tuple[int, List[Tuple[float, Tuple[int, ...]]]]:
+    """Number of profitable loops starting with shard.prefix and the best top_k of them as (end value, node indices)
+
+    search defaults to the one the worker was initialized with."""
+    search = search or _search
+    graph, rules, size, start = search.graph, search.rules, shard.size, search.start
+    found = []
+    profitable = 0
+
+    # Replay the prefix
+    path, currency, value = [], start, search.start_value
+    for depth, i in enumerate(shard.prefix):
+        if currency not in (graph.base[i], graph.quote[i]) or \
+                not _allows(graph, rules, path, i, currency, start, last=depth == size - 1):
+            return 0, []
+        currency, value = _convert(graph, i, currency, value)
+        path.append(i)
+
+    def walk(currency: int, value: float, rate: float):
+        nonlocal profitable
+        depth = len(path)
+        if depth == size:
+            if currency == start and value > search.start_value * search.threshold:
+                profitable += 1
+                item = (value, tuple(path))
+                if search.top_k is None or len(found) < search.top_k:
+                    heapq.heappush(found, item)
+                elif item > found[0]:
+                    heapq.heapreplace(found, item)
+            return
+
+        last = depth == size - 1
+        remaining = size - depth - 1
+        for i in graph.adjacency.get(currency, []):
+            if not _allows(graph, rules, path, i, currency, start, last=last):
+                continue
+
+            node_rate = rate * _rate(graph, i, currency)
+            next_currency, next_value = _convert(graph, i, currency, value)
+            if node_rate * search.bounds[remaining].get(next_currency, 0.0) < search.threshold:
+                continue
+
+            path.append(i)
+            walk(next_currency, next_value, node_rate)
+            path.pop()
+
+    rate = 1.0
+    c = start
+    for i in shard.prefix:
+        rate *= _rate(graph, i, c)
+        c = _next(graph, i, c)
+    walk(currency, value, rate)
+
+    return profitable, found
+
+
+class ParallelEnumerator:
+    """Route search over a process pool, sharded by the first one or two hops
+
+    Workers get a CompactGraph instead of live nodes once, at start, and send back only profitable (or top_k) loops."""
+
+    def __init__(self, nodes: Dict[str, GenericNode], rules: LoopRules = LoopRules()):
+        self.nodes = list(nodes.values())
+        self.rules = rules
+        self.profitable = 0  # Loops above min_profit on the last run, before the top_k cut
+
+        self._currencies: Dict[CEnum, int] = {}
+        for node in self.nodes:
+            for c in [node.base, node.quote]:
+                self._currencies.setdefault(c, len(self._currencies))
+
+        evaluator = RouteEvaluator(nodes=nodes)
+        adjacency = {}
+        for i, node in enumerate(self.nodes):
+            adjacency.setdefault(self._currencies[node.base], []).append(i)
+            if node.quote != node.base:
+                adjacency.setdefault(self._currencies[node.quote], []).append(i)
+
+        self.graph = CompactGraph(base=[self._currencies[node.base] for node in self.nodes],
+                                  quote=[self._currencies[node.quote] for node in self.nodes],
+                                  buy=evaluator.buy.tolist(), sell=evaluator.sell.tolist(), fee=evaluator.fee.tolist(),
+                                  adjacency=adjacency, asks=evaluator.asks, bids=evaluator.bids)
+
+    def shards(self, start: int, size: int, processes: int) -> List[Tuple[int, ...]]:
+        """First hops, or first two hops when that leaves too few shards to balance the pool"""
+        first = [(i,) for i in self.graph.adjacency.get(start, [])]
+        if len(first) >= processes * 4 or size < 3:
+            return first
+
+        second = []
+        for (i,) in first:
+            c = _next(self.graph, i, start)
+            second += [(i, j) for j in self.graph.adjacency.get(c, [])]
+        return second
+
+    def run(self, start_balance: Balance, max_size: int, processes: Optional[int] = None,
+            top_k: Optional[int] = None, min_profit: float = 0.0) -> List[Tuple[float, int, Route, None]]:
+        """Scored routes of sizes 2..max_size, worst to best"""
+        processes = processes or os.cpu_count()
+        self.profitable = 0
+        start = self._currencies.get(start_balance.currency)
+        if start is None:
+            return []
+
+        threshold = 1 + min_profit / 100
+        search = Search(graph=self.graph, bounds=rate_bounds(self.graph, start=start, max_hops=max_size), start=start,
+                        rules=self.rules, start_value=start_balance.value, threshold=threshold, top_k=top_k)
+        jobs = [Shard(size=size, prefix=prefix)
+                for size in range(2, max_size+1) for prefix in self.shards(start=start, size=size, processes=processes)]
+
+        # Graph goes to every worker once, jobs are just (size, prefix)
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker, initargs=(search,)) as ex:
+            results = list(ex.map(enumerate_shard, jobs, chunksize=max(1, len(jobs) // (processes * 8))))
+
+        self.profitable = sum(profitable for profitable, _ in results)
+        found = itertools.chain.from_iterable(found for _, found in results)
+        found = heapq.nlargest(top_k, found) if top_k is not None else list(found)
+
+        found.sort()
+        return [(float(value / start_balance.value - 1) * 100, n, Route([self.nodes[i] for i in path]), None)
+                for n, (value, path) in enumerate(found)]
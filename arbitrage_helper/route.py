@@ -2,14 +2,37 @@ from typing import *
 import itertools
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import random
+import asyncio
+import contextvars
+import time
 
 from tqdm import tqdm
 
 from arbitrage_helper.node import *
+from arbitrage_helper.node import fetch
 from arbitrage_helper.balance import Balance
+from arbitrage_helper.history import QuoteRecorder
+from arbitrage_helper.metrics import metrics
 from arbitrage_helper.currency import *
 
 
+class LoopRules(NamedTuple):
+    """Pruning of economically redundant loops"""
+    no_reversal: bool = True  # A -> B then B -> A on the same node, a guaranteed spread loss
+    no_repeat: bool = False  # Every node at most once
+    no_start_revisit: bool = True  # Start currency only at the ends, otherwise it's shorter loops glued together
+
+    def allows(self, route_nodes: Sequence[GenericNode], node: GenericNode, currency: CEnum, start: CEnum, last: bool) -> bool:
+        """Whether node may follow route_nodes, currency being the one it receives"""
+        if self.no_reversal and route_nodes and route_nodes[-1] is node:
+            return False
+        if self.no_repeat and any(n is node for n in route_nodes):
+            return False
+        if self.no_start_revisit and not last and node.base != node.quote and node.currency_convert(currency) == start:
+            return False
+        return True
+
+
 class Route:
     def __init__(self, nodes: List[GenericNode]):
         self._nodes = nodes
@@ -53,7 +76,17 @@ class Route:
 
         return True
 
+    def is_canonical(self, currency: CEnum, rules: LoopRules = LoopRules()) -> bool:
+        c = currency
+        for i, node in enumerate(self._nodes):
+            if not rules.allows(route_nodes=self._nodes[:i], node=node, currency=c, start=currency, last=i == len(self) - 1):
+                return False
+            c = node.currency_convert(c)
+
+        return True
+
     def forward(self, balance: Balance) -> Tuple[Balance]:
+        """Balances after every hop, element-wise when balance holds an array of amounts"""
         balances = [balance, ]
 
         for node in self._nodes:
@@ -65,6 +98,31 @@ class Route:
 
 
 class RouteGenerator:
+    def __init__(self):
+        self._adjacency: Dict[CEnum, List[GenericNode]] = {}
+        self._adjacency_key: Optional[FrozenSet[int]] = None
+        self.latencies: Dict[str, float] = {}  # alias -> seconds of the last parse
+        self.errors: Dict[str, Exception] = {}  # alias -> what its parse raised in the last cycle
+
+    def adjacency(self, nodes: Dict[str, GenericNode]) -> Dict[CEnum, List[GenericNode]]:
+        """Currency -> nodes that accept it, rebuilt only when the node set changes"""
+        key = frozenset(map(id, nodes.values()))
+        if key != self._adjacency_key:
+            self._adjacency = self.build_adjacency(nodes)
+            self._adjacency_key = key
+
+        return self._adjacency
+
+    @staticmethod
+    def build_adjacency(nodes: Dict[str, GenericNode]) -> Dict[CEnum, List[GenericNode]]:
+        adjacency = {}
+        for node in nodes.values():
+            adjacency.setdefault(node.base, []).append(node)
+            if node.quote != node.base:
+                adjacency.setdefault(node.quote, []).append(node)
+
+        return adjacency
+
     def all_nodes(self, crypto: bool) -> Dict[str, GenericNode]:
         nodes = {}
 
@@ -94,18 +152,124 @@ class RouteGenerator:
 
         return nodes
 
-    def parse_nodes(self, nodes: Dict[str, GenericNode], workers: int = 10) -> Dict[str, GenericNode]:
-        with tqdm(desc="Parsing nodes", total=len(nodes)) as pbar:
-            with ThreadPoolExecutor(max_workers=workers) as ex:
-                def wrapped(node):
-                    node.parse()
-                    pbar.update(1)
+    def parse_nodes(self, nodes: Dict[str, GenericNode], workers: int = 10,
+                    recorder: Optional[QuoteRecorder] = None) -> Dict[str, GenericNode]:
+        self.refresh_nodes(nodes=nodes, workers=workers, recorder=recorder)
+        return self._drop_invalid(nodes)
 
+    def refresh_nodes(self, nodes: Dict[str, GenericNode], workers: int = 10, progress: bool = True,
+                      recorder: Optional[QuoteRecorder] = None):
+        """Parse nodes in place, invalid ones are kept, recorder gets a snapshot of all of them"""
+        ts = time.time()
+        errors: Dict[str, Exception] = {}
+        queued: Dict[str, float] = {}
+
+        # Nodes sharing a page or endpoint fetch it once per cycle
+        with tqdm(desc="Parsing nodes", total=len(nodes), disable=not progress) as pbar, fetch.response_cache():
+            with ThreadPoolExecutor(max_workers=workers) as ex:
+                def wrapped(node, submitted):
+                    started = time.perf_counter()
+                    queued[node.repr] = started - submitted
+                    try:
+                        node.parse()
+                    except Exception as e:
+                        errors[node.repr] = e
+                        raise
+                    finally:
+                        self.latencies[node.repr] = time.perf_counter() - started
+                        pbar.update(1)
+
+                def wrapped_batch(node_cls, batch, submitted):
+                    started = time.perf_counter()
+                    queued.update(dict.fromkeys([node.repr for node in batch], started - submitted))
+                    try:
+                        node_cls.parse_batch(batch)
+                    except Exception as e:
+                        errors.update(dict.fromkeys([node.repr for node in batch], e))
+                        raise
+                    finally:
+                        self.latencies.update(dict.fromkeys([node.repr for node in batch], time.perf_counter() - started))
+                        pbar.update(len(batch))
+
+                # Classes with a batch parser get all their nodes in one call,
+                # workers run in a copy of this context to see this cycle's response cache
+                batches = {}
                 node_keys = list(nodes.keys())
                 random.shuffle(node_keys)
                 for node_key in node_keys:
-                    ex.submit(wrapped, nodes[node_key])
+                    node = nodes[node_key]
+                    if node.batched():
+                        batches.setdefault(node.__class__, []).append(node)
+                    else:
+                        ex.submit(contextvars.copy_context().run, wrapped, node, time.perf_counter())
+
+                for node_cls, batch in batches.items():
+                    ex.submit(contextvars.copy_context().run, wrapped_batch, node_cls, batch, time.perf_counter())
+
+        self.errors = errors
+        self._record_parse(nodes=nodes, errors=errors, queued=queued)
+        if recorder is not None:
+            recorder.append(nodes=nodes, latencies=self.latencies, ts=ts)
+
+    def parse_nodes_async(self, nodes: Dict[str, GenericNode], concurrency: int = 50, per_host: Optional[int] = None,
+                          recorder: Optional[QuoteRecorder] = None) -> Dict[str, GenericNode]:
+        asyncio.run(self.aparse_nodes(nodes=nodes, concurrency=concurrency, per_host=per_host, recorder=recorder))
+        return self._drop_invalid(nodes)
+
+    async def aparse_nodes(self, nodes: Dict[str, GenericNode], concurrency: int = 50, per_host: Optional[int] = None,
+                           recorder: Optional[QuoteRecorder] = None):
+        """Parse on one async client, nodes without a native coroutine run parse() in threads
+
+        per_host caps connections to one source, by default a single source may use all of concurrency."""
+        ts = time.time()
+        errors: Dict[str, Exception] = {}
+
+        with tqdm(desc="Parsing nodes", total=len(nodes)) as pbar, fetch.response_cache():
+            async with fetch.AsyncFetcher(concurrency=concurrency, per_host=per_host) as fetcher:
+                async def wrapped(node):
+                    started = time.perf_counter()
+                    try:
+                        await node.parse_async(fetcher)
+                    except Exception as e:
+                        errors[node.repr] = e
+                    self.latencies[node.repr] = time.perf_counter() - started
+                    pbar.update(1)
+
+                async def wrapped_batch(node_cls, batch):
+                    started = time.perf_counter()
+                    try:
+                        await node_cls.parse_batch_async(batch, fetcher)
+                    except Exception as e:
+                        errors.update(dict.fromkeys([node.repr for node in batch], e))
+                    self.latencies.update(dict.fromkeys([node.repr for node in batch], time.perf_counter() - started))
+                    pbar.update(len(batch))
+
+                # Nodes of unbatched classes are timed one by one
+                batches = {}
+                tasks = []
+                for node in nodes.values():
+                    if node.batched():
+                        batches.setdefault(node.__class__, []).append(node)
+                    else:
+                        tasks.append(wrapped(node))
+
+                await asyncio.gather(*tasks, *[wrapped_batch(node_cls, batch) for node_cls, batch in batches.items()])
+
+        self.errors = errors
+        self._record_parse(nodes=nodes, errors=errors)
+        if recorder is not None:
+            recorder.append(nodes=nodes, latencies=self.latencies, ts=ts)
+
+    def _record_parse(self, nodes: Dict[str, GenericNode], errors: Dict[str, Exception], queued: Optional[Dict[str, float]] = None):
+        """Per node metrics, a parse that didn't raise but left the class default prices counts as invalid"""
+        if not metrics.enabled:
+            return
+        for alias, node in nodes.items():
+            outcome = "error" if alias in errors else "invalid" if node.invalid else "ok"
+            metrics.node_parsed(source=node.source(), latency=self.latencies.get(alias), outcome=outcome,
+                                queued=(queued or {}).get(alias))
 
+    def _drop_invalid(self, nodes: Dict[str, GenericNode]) -> Dict[str, GenericNode]:
         # Filter unchanged nodes
         empty_nodes = []
         for alias, node in nodes.items():
@@ -115,45 +279,108 @@ class RouteGenerator:
         for alias in empty_nodes:
             del nodes[alias]
 
+        self.adjacency(nodes)
         return nodes
 
-    def dumbgen_loop_routes(self, nodes: Dict[str, GenericNode], size: int, currency: CEnum) -> List[Route]:
+    def dumbgen_loop_routes(self, nodes: Dict[str, GenericNode], size: int, currency: CEnum,
+                            rules: LoopRules = LoopRules()) -> List[Route]:
+        adjacency = self.adjacency(nodes)
+
+        # Nodes that can possibly stand at each position, walking adjacency from currency
+        candidates = []
+        currencies = {currency}
+        for _ in range(size):
+            position = {id(node): node for c in currencies for node in adjacency.get(c, [])}
+            candidates.append(list(position.values()))
+            currencies = {node.currency_convert(c) for c in currencies for node in adjacency.get(c, [])}
+
         routes = []
-        n_perms = len(nodes) ** size
+        n_perms = 1
+        for position in candidates:
+            n_perms *= len(position)
         with tqdm(desc="Evaluating routes", total=n_perms, mininterval=n_perms / 10000) as pbar:
             with ThreadPoolExecutor(max_workers=10) as ex:
                 def wrapped(route):
-                    if route.evaluate_loop(currency=currency):
+                    if route.evaluate_loop(currency=currency) and route.is_canonical(currency=currency, rules=rules):
                         routes.append(route)
                     pbar.update(1)
 
-                for route_nodes in itertools.product(*[nodes for _ in range(size)]):
+                for route_nodes in itertools.product(*candidates):
                     ex.submit(wrapped, Route(nodes=route_nodes))
 
         return routes
 
-    def smartgen_loop_routes(self, nodes: Dict[str, GenericNode], size: int, currency: CEnum) -> Generator[Route, None, None]:
-        pbar = tqdm(iterable=self._walk_node_tree(nodes=nodes, route_nodes=[], route_size=size, currency=currency, last_currency=currency),
-                    desc=f"Generating routes, size: {size}, currency: {currency}")
-        for route_nodes in pbar:
-            if (route := Route(route_nodes)).evaluate_loop(currency=currency, size=size):
-                yield route
+    def smartgen_loop_routes(self, nodes: Dict[str, GenericNode], size: int, currency: CEnum,
+                             rules: LoopRules = LoopRules(), min_profit: Optional[float] = None) -> Generator[Route, None, None]:
+        """Loops of size from currency, with min_profit (%) branches that can't reach it at current prices are cut"""
+        adjacency = self.adjacency(nodes)
+        bounds = None if min_profit is None else self.rate_bounds(adjacency=adjacency, currency=currency, max_hops=size)
+        threshold = 1 + (min_profit or 0) / 100
+
+        counts = {"generated": 0, "pruned_rules": 0, "pruned_bound": 0} if metrics.enabled else None
 
-    def _walk_node_tree(self, nodes: Dict[str, GenericNode], route_nodes: List[GenericNode], route_size: int, currency: CEnum, last_currency: CEnum) -> Generator[List[GenericNode], None, None]:
+        pbar = tqdm(iterable=self._walk_node_tree(adjacency=adjacency, route_nodes=[], route_size=size, currency=currency, last_currency=currency, rules=rules,
+                                                  bounds=bounds, threshold=threshold, counts=counts),
+                    desc=f"Generating routes, size: {size}, currency: {currency}")
+        try:
+            for route_nodes in pbar:
+                if (route := Route(route_nodes)).evaluate_loop(currency=currency, size=size):
+                    if counts is not None:
+                        counts["generated"] += 1
+                    yield route
+        finally:
+            # Consumers may stop early, count what was walked so far
+            for stage, count in (counts or {}).items():
+                metrics.routes(stage, count)
+
+    def rate_bounds(self, adjacency: Dict[CEnum, List[GenericNode]], currency: CEnum, max_hops: int) -> List[Dict[CEnum, float]]:
+        """bounds[k][c] - best multiplicative return from c back to currency in exactly k hops, ignoring loop rules"""
+        bounds = [{currency: 1.0}]
+        for _ in range(max_hops):
+            previous = bounds[-1]
+            bound = {}
+            for c, nodes in adjacency.items():
+                best = max((node.rate(c) * previous.get(node.currency_convert(c), 0.0) for node in nodes), default=0.0)
+                if best > 0:
+                    bound[c] = best
+            bounds.append(bound)
+
+        return bounds
+
+    def _walk_node_tree(self, adjacency: Dict[CEnum, List[GenericNode]], route_nodes: List[GenericNode], route_size: int, currency: CEnum, last_currency: CEnum,
+                        rules: LoopRules = LoopRules(), bounds: Optional[List[Dict[CEnum, float]]] = None,
+                        rate: float = 1.0, threshold: float = 1.0,
+                        counts: Optional[Dict[str, int]] = None) -> Generator[List[GenericNode], None, None]:
         # If there are nodes to add
         if len(route_nodes) < route_size:
-            for node in nodes.values():
-                # Node is valid for insertion
-                chain_start = len(route_nodes) != route_size - 1 and currency in [node.base, node.quote]
-                chain_end = len(route_nodes) == route_size - 1 and currency in [node.base, node.quote] and node.currency_convert(currency) == last_currency
-
-                # At the chain start yield node + anything else recursively
+            last = len(route_nodes) == route_size - 1
+            remaining = route_size - len(route_nodes) - 1
+            for node in adjacency.get(currency, []):
+                # Redundant loops are cut before descending
+                if not rules.allows(route_nodes=route_nodes, node=node, currency=currency, start=last_currency, last=last):
+                    if counts is not None:
+                        counts["pruned_rules"] += 1
+                    continue
+
+                # So are branches that can't close above threshold even at the best rates
+                node_rate = rate
+                if bounds is not None:
+                    node_rate = rate * node.rate(currency)
+                    if node_rate * bounds[remaining].get(node.currency_convert(currency), 0.0) < threshold:
+                        if counts is not None:
+                            counts["pruned_bound"] += 1
+                        continue
+
+                # Node is valid for insertion, adjacency guarantees it accepts currency
+                chain_start = not last
+                chain_end = last and node.currency_convert(currency) == last_currency
+
+                # At the chain start yield node + anything else recursively, only full chains come back
                 if chain_start:
-                    for chain_part in self._walk_node_tree(nodes=nodes, route_nodes=route_nodes + [node], route_size=route_size,
-                                                           currency=node.currency_convert(currency), last_currency=last_currency):
+                    for chain_part in self._walk_node_tree(adjacency=adjacency, route_nodes=route_nodes + [node], route_size=route_size,
+                                                           currency=node.currency_convert(currency), last_currency=last_currency, rules=rules,
+                                                           bounds=bounds, rate=node_rate, threshold=threshold, counts=counts):
                         yield [node] + chain_part
-                    else:
-                        yield [node]
 
                 # At the chain end yield last node
                 elif chain_end:
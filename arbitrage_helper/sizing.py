@@ -0,0 +1,88 @@
+from typing import *
+
+import numpy as np
+
+from arbitrage_helper.route import Route
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.currency import *
+
+
+class Sizing(NamedTuple):
+    amount: float  # Start amount with the most absolute profit
+    profit: float
+    perc: float
+    break_even: Optional[Tuple[float, float]]  # Start amounts with profit >= 0, None if there are none
+
+
+class TradeSizer:
+    """Start amount search along a route
+
+    Walking depth is concave in the amount and fixed fees only shift it, so profit(amount) is usually unimodal:
+    the maximum and both break-even points are found by zooming a grid of amounts, one vectorized
+    Route.forward per zoom round. P2P ad limits make it step-shaped, a grid that doesn't rise then fall
+    is swept with dense points instead, so zooming doesn't leave the best step out."""
+
+    def __init__(self, points: int = 64, rounds: int = 5, dense: int = 4096):
+        self.points = points
+        self.rounds = rounds
+        self.dense = dense
+
+    @staticmethod
+    def profit(route: Route, currency: CEnum, amounts: np.ndarray) -> np.ndarray:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.asarray(route.forward(Balance(amounts, currency=currency))[-1].value) - amounts
+
+    def size(self, route: Route, currency: CEnum, max_amount: float) -> Sizing:
+        """Best start amount in (0, max_amount] and the break-even range inside it"""
+        lo, hi = 0.0, max_amount
+        best = (-np.inf, 0.0)
+        for _ in range(self.rounds):
+            amounts = np.linspace(lo, hi, self.points)
+            profit = self._ranked(route=route, currency=currency, amounts=amounts)
+            if not self._unimodal(profit):
+                amounts = np.linspace(lo, hi, self.dense)
+                profit = self._ranked(route=route, currency=currency, amounts=amounts)
+
+            i = int(np.argmax(profit))
+            best = max(best, (profit[i], amounts[i]))
+            lo, hi = amounts[max(i - 1, 0)], amounts[min(i + 1, len(amounts) - 1)]
+
+        amount = float(best[1])
+        profit = float(self.profit(route=route, currency=currency, amounts=np.array([amount]))[0])
+        perc = profit / amount * 100 if amount > 0 else 0.0
+
+        break_even = None
+        if profit >= 0 and amount > 0:
+            break_even = (self._crossing(route=route, currency=currency, lo=0.0, hi=amount, rising=True),
+                          self._crossing(route=route, currency=currency, lo=amount, hi=max_amount, rising=False))
+
+        return Sizing(amount=amount, profit=profit, perc=perc, break_even=break_even)
+
+    def _ranked(self, route: Route, currency: CEnum, amounts: np.ndarray) -> np.ndarray:
+        """Profit with amounts the books can't fill ranked last"""
+        profit = self.profit(route=route, currency=currency, amounts=amounts)
+        return np.where(np.isnan(profit), -np.inf, profit)
+
+    @staticmethod
+    def _unimodal(profit: np.ndarray) -> bool:
+        """Samples never rise again once they started falling"""
+        rising = profit[1:] > profit[:-1]
+        fell = np.logical_or.accumulate(profit[1:] < profit[:-1])
+        return not np.any(rising & fell)
+
+    def size_all(self, routes: Iterable[Route], currency: CEnum, max_amount: float) -> List[Sizing]:
+        return [self.size(route=route, currency=currency, max_amount=max_amount) for route in routes]
+
+    def _crossing(self, route: Route, currency: CEnum, lo: float, hi: float, rising: bool) -> float:
+        """Edge of profit >= 0 between lo and hi, the side past the maximum is capped at hi"""
+        for _ in range(self.rounds):
+            amounts = np.linspace(lo, hi, self.points)
+            positive = self.profit(route=route, currency=currency, amounts=amounts) >= 0
+            if rising:
+                i = int(np.argmax(positive))  # First non-negative
+                lo, hi = amounts[max(i - 1, 0)], amounts[i]
+            else:
+                i = self.points - 1 - int(np.argmax(positive[::-1]))  # Last non-negative
+                lo, hi = amounts[i], amounts[min(i + 1, self.points - 1)]
+
+        return float(hi if rising else lo)
@@ -0,0 +1,73 @@
+from typing import *
+import hashlib
+import os
+
+import numpy as np
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route, RouteGenerator, LoopRules
+from arbitrage_helper.currency import *
+
+
+class TopologyCache:
+    """Loop topologies stored on disk as node index arrays
+
+    Which node sequences form a loop depends only on base/quote currencies, so an entry is keyed by
+    the node aliases, start currency, size and loop rules, prices are plugged in by the caller."""
+
+    VERSION = 1  # Part of every key, bump when enumeration or the stored layout changes so old entries are never read
+
+    def __init__(self, directory: Optional[str] = None):
+        if directory is None:
+            cache_home = os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache"))
+            directory = os.path.join(cache_home, "arbitrage_helper", "topology")
+        self.directory = directory
+
+    @staticmethod
+    def node_order(nodes: Dict[str, GenericNode]) -> List[str]:
+        return sorted(nodes)
+
+    def key(self, nodes: Dict[str, GenericNode], currency: CEnum, size: int, rules: LoopRules = LoopRules()) -> str:
+        digest = hashlib.sha1(f"v{self.VERSION}\0".encode())
+        for alias in self.node_order(nodes):
+            digest.update(alias.encode())
+            digest.update(b"\0")
+        digest.update(f"{currency.repr}|{size}|{tuple(rules)}".encode())
+        return digest.hexdigest()
+
+    def path(self, nodes: Dict[str, GenericNode], currency: CEnum, size: int, rules: LoopRules = LoopRules()) -> str:
+        return os.path.join(self.directory, f"{self.key(nodes=nodes, currency=currency, size=size, rules=rules)}.npy")
+
+    def load(self, nodes: Dict[str, GenericNode], currency: CEnum, size: int,
+             rules: LoopRules = LoopRules()) -> Optional[np.ndarray]:
+        path = self.path(nodes=nodes, currency=currency, size=size, rules=rules)
+        if os.path.exists(path):
+            return np.load(path, mmap_mode="r")
+        else:
+            return None
+
+    def save(self, nodes: Dict[str, GenericNode], currency: CEnum, size: int, routes: Iterable[Route],
+             rules: LoopRules = LoopRules()) -> np.ndarray:
+        index = {id(nodes[alias]): i for i, alias in enumerate(self.node_order(nodes))}
+        dtype = np.uint16 if len(index) <= np.iinfo(np.uint16).max else np.uint32
+        topology = np.array([[index[id(node)] for node in route.nodes] for route in routes], dtype=dtype).reshape(-1, size)
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(nodes=nodes, currency=currency, size=size, rules=rules)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, topology)
+        os.replace(tmp_path, path)
+
+        return topology
+
+    def routes(self, route_gen: RouteGenerator, nodes: Dict[str, GenericNode], currency: CEnum, size: int,
+               rules: LoopRules = LoopRules()) -> List[Route]:
+        """Cached loops of size, enumerated and stored on a miss"""
+        if (topology := self.load(nodes=nodes, currency=currency, size=size, rules=rules)) is None:
+            routes = list(route_gen.smartgen_loop_routes(nodes=nodes, size=size, currency=currency, rules=rules))
+            self.save(nodes=nodes, currency=currency, size=size, routes=routes, rules=rules)
+            return routes
+
+        ordered = [nodes[alias] for alias in self.node_order(nodes)]
+        return [Route([ordered[i] for i in row]) for row in topology.tolist()]
@@ -0,0 +1,81 @@
+"""Node refresh against the local stub, threads vs async, latency percentiles per source and per refresh
+
+python -m bench.parse --latency 0.05 --jitter 0.02 --error-rate 0.01 --rounds 5
+"""
+from typing import *
+import argparse
+import time
+
+import numpy as np
+
+from arbitrage_helper.node import *
+from arbitrage_helper.node import fetch
+from arbitrage_helper.route import RouteGenerator
+from bench.stub import StubServer, Profile
+
+
+SOURCES = (BinanceExchange, BinanceP2P, GarantexExchange, CryptologyExchange, Vexel, Tinkoff, Jusan, Paysera, MOEX, KASE,
+           GenericPaysend)
+PERCENTILES = (50, 90, 99)
+
+
+def stubbed_nodes(crypto: bool = True) -> Dict[str, GenericNode]:
+    nodes = RouteGenerator().all_nodes(crypto=crypto)
+    return {alias: node for alias, node in nodes.items() if isinstance(node, SOURCES)}
+
+
+def source(node: GenericNode) -> type:
+    return next(cls for cls in SOURCES if isinstance(node, cls))
+
+
+def percentiles(values: Sequence[float]) -> str:
+    return "  ".join(f"p{p} {v * 1000:7.1f}ms" for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)))
+
+
+def bench(latency: float, jitter: float, error_rate: float, workers: int, concurrency: int, rounds: int,
+          profiles: Optional[Dict[str, Profile]] = None, per_host: Optional[int] = None):
+    with StubServer(latency=latency, jitter=jitter, error_rate=error_rate, profiles=profiles) as stub, \
+            fetch.redirected(stub.origins):
+        for name, parse in [(f"threads ({workers})", lambda g, n: g.parse_nodes(nodes=n, workers=workers)),
+                            (f"async ({concurrency})", lambda g, n: g.parse_nodes_async(nodes=n, concurrency=concurrency, per_host=per_host))]:
+            stub.reset()
+            fetch.sessions.reset_stats()
+
+            refreshes = []
+            by_source: Dict[type, List[float]] = {}
+            valid: Dict[type, List[int]] = {}
+            for _ in range(rounds):
+                route_gen = RouteGenerator()
+                nodes = stubbed_nodes()
+                sources = {alias: source(node) for alias, node in nodes.items()}
+
+                start = time.perf_counter()
+                parsed = parse(route_gen, nodes)
+                refreshes.append(time.perf_counter() - start)
+
+                for alias, cls in sources.items():
+                    by_source.setdefault(cls, []).append(route_gen.latencies.get(alias, np.nan))
+                    valid.setdefault(cls, []).append(alias in parsed)
+
+            print(f"{name}: {rounds} refreshes, {stub.requests} requests, refresh {percentiles(refreshes)}")
+            for cls, latencies in by_source.items():
+                print(f"  {cls.__name__:20} {len(latencies) // rounds:4} nodes  {np.mean(valid[cls]) * 100:5.1f}% valid  "
+                      f"{percentiles(latencies)}")
+            print("  requests: " + ", ".join(f"{prefix.strip('/')} {count}" for prefix, count in stub.counts.items() if count))
+            if report := fetch.sessions.report():
+                print(report)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=25)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--per-host", type=int, default=None, help="connections per source in async mode, concurrency by default")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    bench(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, workers=args.workers,
+          concurrency=args.concurrency, rounds=args.rounds, per_host=args.per_host)
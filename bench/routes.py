@@ -0,0 +1,192 @@
+"""Route generation and evaluation on synthetic FixedRate graphs, results are stored to diff against the next run
+
+python -m bench.routes --nodes 50 200 1000 5000 --sizes 2 3 4 5 6 --output bench_routes.json
+"""
+from typing import *
+from contextlib import redirect_stderr
+import argparse
+import itertools
+import tracemalloc
+import random
+import math
+import json
+import time
+import io
+import os
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route, RouteGenerator
+from arbitrage_helper.arbitrage import Arbitrage
+from arbitrage_helper.evaluator import RouteEvaluator
+from arbitrage_helper.currency import *
+
+
+CURRENCIES = [c for c in [*Fiat, *Stable, *Crypto] if c != Fiat.NONE]
+
+
+def synthetic_nodes(n_nodes: int, n_currencies: int = len(CURRENCIES), density: float = 1.0,
+                    spread: float = 0.002, noise: float = 0.003, seed: int = 0) -> Dict[str, GenericNode]:
+    """n_nodes FixedRate nodes spread over density * all pairs of the first n_currencies
+
+    Prices come from one value per currency plus noise, so most loops lose the spread and some don't."""
+    rnd = random.Random(seed)
+    currencies = CURRENCIES[:n_currencies]
+    values = {c: rnd.lognormvariate(0, 2) for c in currencies}
+
+    pairs = list(itertools.combinations(currencies, 2))
+    rnd.shuffle(pairs)
+    pairs = pairs[:max(1, round(density * len(pairs)))]
+
+    nodes = {}
+    for i in range(n_nodes):
+        base, quote = pairs[i % len(pairs)]
+        mid = values[base] / values[quote] * (1 + rnd.uniform(-noise, noise))
+        node = FixedRate(base, quote, buy_price=mid * (1 + spread), sell_price=mid * (1 - spread), name=f"Venue{i // len(pairs)}")
+        nodes[node.repr] = node
+
+    return nodes
+
+
+def dumbgen_permutations(route_gen: RouteGenerator, nodes: Dict[str, GenericNode], size: int, currency: CEnum) -> int:
+    """Candidates dumbgen_loop_routes would try, same walk over the adjacency"""
+    adjacency = route_gen.adjacency(nodes)
+    n_perms, currencies = 1, {currency}
+    for _ in range(size):
+        n_perms *= len({id(node) for c in currencies for node in adjacency.get(c, [])})
+        currencies = {node.currency_convert(c) for c in currencies for node in adjacency.get(c, [])}
+    return n_perms
+
+
+def measure(run: Callable[[], int], memory: bool) -> Dict[str, Any]:
+    """Time run() (it returns a route count), then again under tracemalloc for peak memory and blocks still held after it"""
+    with redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        routes = run()
+        seconds = time.perf_counter() - start
+
+        result = {"routes": routes, "seconds": round(seconds, 6), "routes_per_sec": round(routes / seconds, 1) if seconds else None}
+        if memory:
+            tracemalloc.start()
+            run()
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+            result["blocks"] = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+            tracemalloc.stop()
+
+    return result
+
+
+def bench(node_counts: Sequence[int], sizes: Sequence[int], n_currencies: int, density: float, max_routes: int,
+          budget: float, dumb_limit: int, memory: bool, seed: int = 0) -> List[Dict[str, Any]]:
+    results = []
+    arbitrage = Arbitrage()
+    start_balance = Balance(1000, CURRENCIES[0])
+
+    def record(stage: str, n_nodes: int, size: int, result: Dict[str, Any], truncated: bool = False):
+        result = {"case": f"{stage} nodes={n_nodes} size={size}", "stage": stage, "nodes": n_nodes, "size": size,
+                  "truncated": truncated, **result}
+        results.append(result)
+        print(f"{result['case']:32} {result['routes']:>9} routes  {result['seconds']:9.3f}s  "
+              f"{result['routes_per_sec'] or 0:>12.0f} routes/s"
+              + (f"  peak {result['peak_bytes'] / 2**20:8.1f} MiB  {result['blocks']:>9} blocks" if memory else "")
+              + ("  (truncated)" if truncated else ""))
+
+    for n_nodes in node_counts:
+        nodes = synthetic_nodes(n_nodes=n_nodes, n_currencies=n_currencies, density=density, seed=seed)
+        route_gen = RouteGenerator()
+        currency = start_balance.currency
+
+        for size in sizes:
+            # Timed generation stops at max_routes or after budget seconds, the traced rerun at the same count
+            routes: List[Route] = []
+            passes: List[int] = []
+            truncated = [False]
+
+            def smartgen() -> int:
+                routes.clear()
+                timed = not passes
+                deadline = time.perf_counter() + budget if timed else math.inf
+                limit = max_routes if timed else passes[0]
+                for route in route_gen.smartgen_loop_routes(nodes=nodes, size=size, currency=currency):
+                    routes.append(route)
+                    if len(routes) >= limit or time.perf_counter() > deadline:
+                        truncated[0] |= timed
+                        break
+                passes.append(len(routes))
+                return len(routes)
+
+            record("smartgen", n_nodes, size, measure(smartgen, memory=memory), truncated=truncated[0])
+
+            if dumbgen_permutations(route_gen, nodes, size, currency) <= dumb_limit:
+                record("dumbgen", n_nodes, size,
+                       measure(lambda: len(route_gen.dumbgen_loop_routes(nodes=nodes, size=size, currency=currency)), memory=memory))
+
+            if not routes:
+                continue
+
+            # Scoring and selection as in Arbitrage.run, without the parse and the printing
+            def forward() -> int:
+                arbitrage.select_best(arbitrage.score_routes(start_balance=start_balance, routes=routes))
+                return len(routes)
+
+            def compiled() -> int:
+                evaluator = RouteEvaluator(nodes=nodes)
+                arbitrage.select_best(arbitrage.score_routes_compiled(start_balance=start_balance, routes=iter(routes), evaluator=evaluator))
+                return len(routes)
+
+            record("forward", n_nodes, size, measure(forward, memory=memory))
+            record("compiled", n_nodes, size, measure(compiled, memory=memory))
+
+    return results
+
+
+def compare(previous: List[Dict[str, Any]], results: List[Dict[str, Any]], tolerance: float = 0.2,
+            min_seconds: float = 0.05, min_peak: int = 2**20) -> str:
+    """routes/s and peak memory against the previous run, cases beyond tolerance are flagged
+
+    Cases too short or too small to measure reliably are listed but never flagged."""
+    before = {result["case"]: result for result in previous}
+    lines = []
+    for result in results:
+        if (old := before.get(result["case"])) is None or not old.get("routes_per_sec") or not result.get("routes_per_sec"):
+            continue
+
+        speed = result["routes_per_sec"] / old["routes_per_sec"] - 1
+        line = f"{result['case']:32} routes/s {speed * 100:+7.1f}%"
+        flag = speed < -tolerance and min(result["seconds"], old["seconds"]) >= min_seconds
+        if old.get("peak_bytes") and result.get("peak_bytes"):
+            peak = result["peak_bytes"] / old["peak_bytes"] - 1
+            line += f"  peak {peak * 100:+7.1f}%"
+            flag |= peak > tolerance and max(result["peak_bytes"], old["peak_bytes"]) >= min_peak
+        lines.append(line + ("  <<" if flag else ""))
+
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--nodes", type=int, nargs="+", default=[50, 200, 1000, 5000])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 3, 4, 5, 6])
+    parser.add_argument("--currencies", type=int, default=len(CURRENCIES))
+    parser.add_argument("--density", type=float, default=0.3, help="share of currency pairs with nodes")
+    parser.add_argument("--max-routes", type=int, default=500_000)
+    parser.add_argument("--budget", type=float, default=30.0, help="seconds of generation per case")
+    parser.add_argument("--dumb-limit", type=int, default=200_000, help="largest dumbgen candidate product to run")
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative change flagged as a regression")
+    parser.add_argument("--output", default="bench_routes.json", help="results file, the previous one is diffed first")
+    args = parser.parse_args()
+
+    results = bench(node_counts=args.nodes, sizes=args.sizes, n_currencies=args.currencies, density=args.density,
+                    max_routes=args.max_routes, budget=args.budget, dumb_limit=args.dumb_limit,
+                    memory=not args.no_memory, seed=args.seed)
+
+    if os.path.exists(args.output):
+        with open(args.output) as file:
+            previous = json.load(file)
+        if diff := compare(previous, results, tolerance=args.tolerance):
+            print(f"\nvs {args.output}:\n{diff}")
+
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=1, sort_keys=True)
+        file.write("\n")
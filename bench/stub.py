@@ -0,0 +1,204 @@
+from typing import *
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import multiprocessing
+import random
+import json
+import time
+
+from arbitrage_helper.currency import *
+
+
+PAYSEND_XPATH = "/html[1]/body[1]/div[1]/div[3]/div[1]/div[1]/div[1]/div[1]/div[2]/div[1]/div[1]/div[1]/div[2]/div[1]/span[1]"
+KASE_SECURITIES = ["USDKZT_TOM", "EURKZT_TOM", "RUBKZT_TOM", "EURUSD_TOM"]
+
+
+def html_at(xpath: str, text: str) -> str:
+    """Smallest page where an absolute /tag[n]/... xpath finds one element holding text"""
+    steps = [step.rstrip("]").split("[") for step in xpath.strip("/").split("/")]
+
+    def build(i: int) -> str:
+        if i == len(steps):
+            return text
+        tag, n = steps[i][0], int(steps[i][1]) if len(steps[i]) > 1 else 1
+        return f"<{tag}></{tag}>" * (n - 1) + f"<{tag}>{build(i + 1)}</{tag}>"
+
+    return "<!DOCTYPE html>" + build(0)
+
+
+def kase_page(bid: str = "0,99", ask: str = "1,01") -> str:
+    """Currency table, security link in td 1, bid and ask in td 8 and 9"""
+    rows = "".join(f"<tr><td><a href=\"#\">{security}</a></td>{'<td>0</td>' * 6}<td>{bid}</td><td>{ask}</td></tr>"
+                   for security in KASE_SECURITIES)
+    return f"<!DOCTYPE html><html><body><table><thead><tr><th>Security</th></tr></thead><tbody>{rows}</tbody></table></body></html>"
+
+
+class Profile(NamedTuple):
+    latency: float = 0.05  # Seconds before every response
+    jitter: float = 0.0  # Mean of an exponential extra delay on top of latency
+    error_rate: float = 0.0  # Share of requests answered with 503
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # bursts of connects would overflow the default backlog of 5
+
+
+class StubServer:
+    """Local stand-in for the sources, serves canned responses shaped like the live ones
+
+    Latency, jitter and error rate are set per source prefix through profiles, the rest use the defaults.
+    Runs in a forked process so it doesn't compete with the client for the GIL."""
+
+    ORIGINS = {
+        "https://api.binance.com": "/binance",
+        "https://p2p.binance.com": "/p2p",
+        "https://garantex.io": "/garantex",
+        "https://api.cryptology.com": "/cryptology",
+        "https://vexel.online": "/vexel",
+        "https://bank.paysera.com": "/paysera",
+        "https://api.tinkoff.ru": "/tinkoff",
+        "https://jusan.kz": "/jusan",
+        "https://iss.moex.com": "/moex",
+        "https://kase.kz": "/kase",
+        "https://paysend.com": "/paysend",
+    }
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.0, error_rate: float = 0.0,
+                 profiles: Optional[Dict[str, Profile]] = None, seed: int = 0, host: str = "127.0.0.1", port: int = 0):
+        self.profile = Profile(latency=latency, jitter=jitter, error_rate=error_rate)
+        self.profiles = profiles or {}  # "/kase" -> Profile
+        self._random = random.Random(seed)
+
+        # Per prefix, unknown paths count in the last slot
+        self._prefixes = list(self.ORIGINS.values())
+        self._requests = multiprocessing.Array("i", len(self._prefixes) + 1)
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                stub._serve(self, body=None)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                stub._serve(self, body=json.loads(self.rfile.read(length) or b"null"))
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _Server((host, port), Handler)
+        self._process = multiprocessing.get_context("fork").Process(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def requests(self) -> int:
+        return sum(self._requests)
+
+    @property
+    def counts(self) -> Dict[str, int]:
+        """Requests per source prefix"""
+        return dict(zip(self._prefixes, self._requests[:len(self._prefixes)]))
+
+    def reset(self):
+        with self._requests.get_lock():
+            self._requests[:] = [0] * len(self._requests)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def origins(self) -> Dict[str, str]:
+        """Mapping for fetch.redirected()"""
+        return {origin: self.url + prefix for origin, prefix in self.ORIGINS.items()}
+
+    def __enter__(self) -> "StubServer":
+        self._process.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.join()
+        self._server.server_close()
+
+    def _serve(self, handler: BaseHTTPRequestHandler, body: Any):
+        url = urlparse(handler.path)
+        slot = next((i for i, prefix in enumerate(self._prefixes) if url.path.startswith(prefix + "/")), len(self._prefixes))
+        with self._requests.get_lock():
+            self._requests[slot] += 1
+
+        profile = self.profiles.get(self._prefixes[slot], self.profile) if slot < len(self._prefixes) else self.profile
+        time.sleep(profile.latency + (self._random.expovariate(1 / profile.jitter) if profile.jitter > 0 else 0.0))
+
+        if self._random.random() < profile.error_rate:
+            status, payload = 503, {"error": "unavailable"}
+        else:
+            status, payload = self.respond(path=url.path, query=parse_qs(url.query), body=body)
+
+        if isinstance(payload, str):
+            payload = payload.encode()
+        content = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+
+        handler.send_response(status)
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        handler.wfile.write(content)
+
+    def respond(self, path: str, query: Dict[str, List[str]], body: Any) -> Tuple[int, Any]:
+        if path.startswith("/binance/"):
+            symbols = [c.value for c in [*Stable, *Crypto, *BinanceFiat]]
+            tickers = [{"symbol": b + q, "askPrice": "1.001", "bidPrice": "0.999"} for b in symbols for q in symbols if b != q]
+            if "symbol" in query:
+                if (ticker := next((t for t in tickers if t["symbol"] == query["symbol"][0]), None)) is None:
+                    return 400, {"code": -1121, "msg": "Invalid symbol."}
+                return 200, ticker
+            return 200, tickers
+
+        elif path.startswith("/p2p/"):
+            price = 1.01 if body["tradeType"] == "BUY" else 0.99
+            methods = body["payTypes"] or ["Tinkoff", "RosBank", "Paysend", "Uzcard", "Kapitalbank", "PermataMe", "BANK", "JysanBank"]
+            return 200, {"data": [{"adv": {"price": str(price), "tradableQuantity": "1000",
+                                           "minSingleTransAmount": "10", "maxSingleTransAmount": "500",
+                                           "tradeMethods": [{"identifier": m}]}} for m in methods]}
+
+        elif path.startswith("/garantex/"):
+            return 200, {"asks": [{"price": "1.01", "volume": "1000"}], "bids": [{"price": "0.99", "volume": "1000"}]}
+
+        elif path.startswith("/cryptology/"):
+            return 200, {"data": {"asks": [["1.01", "1000"]], "bids": [["0.99", "1000"]]}}
+
+        elif path.startswith("/vexel/"):
+            return 200, {"data": {"rate": "0.99"}}
+
+        elif path.startswith("/paysera/"):
+            if "to_amount" in query:
+                amount = float(query["to_amount"][0])
+                return 200, {"rates": [{"from_amount": f"{amount * 1.01:.2f}", "to_amount": f"{amount:.2f}"}]}
+            amount = float(query["from_amount"][0])
+            return 200, {"rates": [{"from_amount": f"{amount:.2f}", "to_amount": f"{amount * 0.99:.2f}"}]}
+
+        elif path.startswith("/tinkoff/"):
+            names = [c.value for c in Fiat if c != Fiat.NONE]
+            pairs = [(query["from"][0], query["to"][0])] if "from" in query else [(b, q) for b in names for q in names if b != q]
+            return 200, {"payload": {"rates": [{"category": category, "fromCurrency": {"name": b}, "toCurrency": {"name": q},
+                                                "buy": 0.99, "sell": 1.01}
+                                               for b, q in pairs for category in ["CBRF", "DebitCardsOperations"]]}}
+
+        elif path.startswith("/jusan/"):
+            names = [c.value for c in Fiat if c != Fiat.NONE]
+            return 200, [{"currencyFrom": b, "currencyTo": q, "buyingSum": 1.01, "saleSum": 0.99} for b in names for q in names if b != q]
+
+        elif path.startswith("/moex/"):
+            return 200, {"candles": [{"data": [[1700000000000, 1.0, 1.02, 0.98, 0.999], [1700086400000, 0.999, 1.01, 0.99, 1.0]]}]}
+
+        elif path.startswith("/kase/"):
+            return 200, kase_page()
+
+        elif path.startswith("/paysend/"):
+            return 200, html_at(PAYSEND_XPATH, "1 XXX = 0.99 YYY")
+
+        return 404, {"error": "not found"}
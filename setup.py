@@ -10,5 +10,6 @@ with open("README.md", "r") as file:
 
 setup(name=PACKAGE_NAME,
       version=__version__,
-      install_requires=["selenium", "tqdm", "requests", "lxml", "python-decouple"],
-      packages=find_packages())
+      install_requires=["selenium", "tqdm", "requests", "lxml", "python-decouple", "numpy"],
+      extras_require={"async": ["httpx[http2]"]},
+      packages=find_packages(exclude=["bench", "bench.*"]))
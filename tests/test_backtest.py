@@ -0,0 +1,99 @@
+from typing import *
+import random
+
+import numpy as np
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route, RouteGenerator
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.history import QuoteRecorder
+from arbitrage_helper.backtest import Backtest
+from arbitrage_helper.currency import *
+
+
+CURRENCIES = [Fiat.USD, Fiat.RUB, Stable.USDT, Crypto.BTC]
+VALUES = {Fiat.USD: 1.0, Fiat.RUB: 0.011, Stable.USDT: 1.0, Crypto.BTC: 30000.0}
+START = Balance(1000, Fiat.USD)
+
+
+class History(NamedTuple):
+    recorder: QuoteRecorder
+    nodes: Dict[str, GenericNode]
+    quotes: List[Dict[str, Tuple[float, float]]]  # Per snapshot, alias -> buy, sell, missing when not recorded
+    routes: List[Route]
+
+
+@pytest.fixture
+def history(tmp_path) -> History:
+    """Seeded random walk of two venues per pair, some nodes skip snapshots, replayed results are exact"""
+    rnd = random.Random(0)
+    nodes = [FixedRate(b, q, name=f"Venue{v}") for i, b in enumerate(CURRENCIES) for q in CURRENCIES[i+1:] for v in range(2)]
+    nodes.append(PercFee(fee_perc=0.5, name="Transfer"))
+    nodes = {node.repr: node for node in nodes}
+    mids = {alias: VALUES[node.base] / VALUES[node.quote] for alias, node in nodes.items() if not isinstance(node, PercFee)}
+
+    recorder = QuoteRecorder(str(tmp_path))
+    quotes = []
+    for t in range(40):
+        snapshot = {}
+        for alias, mid in mids.items():
+            mids[alias] = mid = mid * (1 + rnd.uniform(-0.01, 0.01))
+            if rnd.random() < 0.9:
+                snapshot[alias] = (mid * 1.001, mid * 0.999)
+        for alias, (buy, sell) in snapshot.items():
+            nodes[alias]._buy_price, nodes[alias]._sell_price = buy, sell
+        recorder.append({alias: nodes[alias] for alias in snapshot}, ts=1000.0 + 5 * t)
+        quotes.append(snapshot)
+
+    routes = [route for size in range(2, 5) for route in RouteGenerator().smartgen_loop_routes(nodes=nodes, size=size, currency=START.currency)]
+    return History(recorder=recorder, nodes=nodes, quotes=quotes, routes=routes)
+
+
+def test_replay_matches_forward(history: History):
+    backtest = Backtest(history.recorder, history.nodes)
+    perc = np.hstack([block for _, block in backtest.profits(routes=history.routes, start_balance=START)])
+    assert perc.shape == (len(history.routes), len(history.quotes))
+
+    # Same prices through Route.forward, nodes keep their last recorded quote, nan until all of them were recorded
+    seen = set()
+    for t, snapshot in enumerate(history.quotes):
+        seen |= snapshot.keys()
+        backtest.inject(t)
+        for i, route in enumerate(history.routes):
+            if all(node.repr in seen for node in route.nodes if not isinstance(node, PercFee)):
+                assert perc[i, t] == (route.forward(START)[-1].value / START.value - 1) * 100
+            else:
+                assert np.isnan(perc[i, t])
+
+
+def test_loop_stats(history: History):
+    backtest = Backtest(history.recorder, history.nodes)
+    perc = np.hstack([block for _, block in backtest.profits(routes=history.routes, start_balance=START)])
+    stats = backtest.loop_stats(routes=history.routes, start_balance=START, threshold=-1.0)
+
+    # Scalar reference, a snapshot lasts until the next one
+    dt = np.append(np.diff(backtest.history.ts), 0.0)
+    for i in range(len(history.routes)):
+        above = perc[i] > -1.0  # nan compares False
+        episodes = int(above[0]) + int(np.sum(above[1:] & ~above[:-1]))
+        runs, run = [0.0], 0.0
+        for a, d in zip(above, dt):
+            run = run + d if a else 0.0
+            runs.append(run)
+
+        assert stats.episodes[i] == episodes
+        assert stats.time_above[i] == pytest.approx(float(np.sum(dt[above])))
+        assert stats.longest[i] == pytest.approx(max(runs))
+        assert stats.best[i] == np.nanmax(perc[i])
+
+
+def test_unrecorded_node_is_nan(history: History):
+    """A node without history must not be scored from its live price"""
+    extra = FixedRate(Fiat.USD, Fiat.RUB, buy_price=1.0, sell_price=1000.0, name="Live")
+    nodes = {**history.nodes, extra.repr: extra}
+    recorded = next(node for node in history.nodes.values() if {node.base, node.quote} == {Fiat.USD, Fiat.RUB})
+    routes = [Route([extra, recorded])]
+
+    _, perc = next(Backtest(history.recorder, nodes).profits(routes=routes, start_balance=START))
+    assert np.isnan(perc).all()
@@ -0,0 +1,67 @@
+from typing import *
+from urllib.parse import urlsplit, parse_qs
+import json
+
+import pytest
+
+from arbitrage_helper.node import fetch
+from arbitrage_helper.node.bank import Tinkoff
+from arbitrage_helper.currency import *
+
+
+RATES = {("USD", "RUB"): (90.0, 95.0), ("EUR", "RUB"): (98.0, 104.0), ("USD", "EUR"): (0.9, 0.95)}
+
+
+class Response(NamedTuple):
+    content: bytes
+
+
+class Registry:
+    """Tinkoff currency_rates, the full table lacks USD/EUR like the real one lacks some pairs"""
+
+    def __init__(self, table_up: bool = True):
+        self.table_up = table_up
+        self.urls: List[str] = []
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        self.urls.append(url)
+        query = parse_qs(urlsplit(url).query)
+        if "from" in query:
+            pairs = [(query["from"][0], query["to"][0])]
+        elif self.table_up:
+            pairs = [pair for pair in RATES if pair != ("USD", "EUR")]
+        else:
+            return Response(b"<html>503 Service Unavailable</html>")
+
+        rates = []
+        for b, q in pairs:
+            buy, sell = RATES[b, q]
+            for category, scale in [("CreditCardsTransfers", 2), ("DebitCardsOperations", 1)]:
+                rates.append({"category": category, "fromCurrency": {"name": b}, "toCurrency": {"name": q},
+                              "buy": buy * scale, "sell": sell * scale})
+        return Response(json.dumps({"payload": {"rates": rates}}).encode())
+
+
+def nodes() -> List[Tinkoff]:
+    return [Tinkoff(Fiat.USD, Fiat.RUB), Tinkoff(Fiat.EUR, Fiat.RUB), Tinkoff(Fiat.USD, Fiat.EUR)]
+
+
+def prices(nodes: List[Tinkoff]) -> List[Tuple[float, float]]:
+    return [(node.buy_price, node.sell_price) for node in nodes]
+
+
+@pytest.mark.parametrize("table_up", [True, False])
+def test_batch_matches_single(monkeypatch, table_up: bool):
+    registry = Registry(table_up=table_up)
+    monkeypatch.setattr(fetch, "sessions", registry)
+
+    single = nodes()
+    for node in single:
+        node.parse()
+    batched = nodes()
+    Tinkoff.parse_batch(batched)
+
+    assert prices(single) == [(95.0, 90.0), (104.0, 98.0), (0.95, 0.9)]
+    assert prices(batched) == prices(single)
+    # Table, then per-pair requests for what it didn't cover
+    assert len(registry.urls) == len(single) + 1 + (1 if table_up else len(batched))
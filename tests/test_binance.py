@@ -0,0 +1,74 @@
+from typing import *
+import json
+
+import pytest
+
+from arbitrage_helper.node import fetch
+from arbitrage_helper.node.exchange.binance import BinanceExchange, BOOK_TICKER_URL
+from arbitrage_helper.currency import *
+
+
+TICKERS = [{"symbol": "BTCUSDT", "askPrice": "30001.0", "bidPrice": "30000.0"},
+           {"symbol": "ETHUSDT", "askPrice": "2001.0", "bidPrice": "2000.0"}]
+
+
+class Response(NamedTuple):
+    content: bytes
+
+
+class Registry:
+    """Answers like the bookTicker endpoint and records every url"""
+
+    def __init__(self):
+        self.urls: List[str] = []
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        self.urls.append(url)
+        if "?symbol=" in url:
+            symbol = url.split("?symbol=")[1]
+            payload = next((t for t in TICKERS if t["symbol"] == symbol), {"code": -1121, "msg": "Invalid symbol."})
+        else:
+            payload = TICKERS
+        return Response(json.dumps(payload).encode())
+
+
+@pytest.fixture
+def registry(monkeypatch) -> Registry:
+    registry = Registry()
+    monkeypatch.setattr(fetch, "sessions", registry)
+    return registry
+
+
+def nodes() -> List[BinanceExchange]:
+    return [BinanceExchange(Crypto.BTC, Stable.USDT), BinanceExchange(Crypto.ETH, Stable.USDT), BinanceExchange(Crypto.BTC, Fiat.RUB)]
+
+
+def prices(nodes: List[BinanceExchange]) -> List[Tuple[float, float, bool]]:
+    return [(node.buy_price, node.sell_price, node.invalid) for node in nodes]
+
+
+def test_parse_without_cache_asks_for_its_symbol(registry: Registry):
+    parsed = nodes()
+    for node in parsed:
+        node.parse()
+
+    assert registry.urls == [f"{BOOK_TICKER_URL}?symbol={node.symbol}" for node in parsed]
+    assert prices(parsed) == [(30001.0, 30000.0, False), (2001.0, 2000.0, False), *prices(nodes()[2:])]
+
+
+def test_bulk_fetch_inside_cache_and_batch(registry: Registry):
+    single = nodes()
+    for node in single:
+        node.parse()
+
+    cached = nodes()
+    with fetch.response_cache():
+        for node in cached:
+            node.parse()
+    assert registry.urls[len(single):] == [BOOK_TICKER_URL]
+
+    batched = nodes()
+    BinanceExchange.parse_batch(batched)
+    assert registry.urls[len(single) + 1:] == [BOOK_TICKER_URL]
+
+    assert prices(cached) == prices(batched) == prices(single)
@@ -0,0 +1,65 @@
+from typing import *
+import itertools
+import random
+
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.node.depth import Depth
+from arbitrage_helper.route import RouteGenerator
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.arbitrage import Arbitrage
+from arbitrage_helper.book import RouteBook
+from arbitrage_helper.currency import *
+
+
+CURRENCIES = [Fiat.USD, Fiat.EUR, Fiat.RUB, Stable.USDT, Crypto.BTC]
+START = Balance(1000, Fiat.USD)
+
+
+def random_nodes(rnd: random.Random) -> Dict[str, GenericNode]:
+    values = {c: rnd.lognormvariate(0, 2) for c in CURRENCIES}
+    nodes = []
+    for venue in range(2):
+        for base, quote in itertools.combinations(CURRENCIES, 2):
+            mid = values[base] / values[quote]
+            nodes.append(FixedRate(base, quote, buy_price=mid * 1.002, sell_price=mid * 0.998, name=f"Venue{venue}"))
+    nodes.append(FixedFee(Fiat.USD, fee_value=0.5, name="Withdraw"))
+    return {node.repr: node for node in nodes}
+
+
+def move(rnd: random.Random, node: GenericNode):
+    """New top of book, sometimes with depth, sometimes losing it"""
+    factor = 1 + rnd.uniform(-0.02, 0.02)
+    node._buy_price, node._sell_price = node._buy_price * factor, node._sell_price * factor
+    if rnd.random() < 0.3:
+        node._asks = Depth([node._buy_price, node._buy_price * 1.01], [0.01 / node._buy_price * 1000, 1e9])
+        node._bids = Depth([node._sell_price, node._sell_price * 0.99], [1.0, 1e9])
+    else:
+        node._asks = node._bids = None
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_incremental_update_matches_full_rescore(seed: int):
+    rnd = random.Random(seed)
+    nodes = random_nodes(rnd)
+    routes = [route for size in range(2, 5) for route in RouteGenerator().smartgen_loop_routes(nodes=nodes, size=size, currency=START.currency)]
+    book = RouteBook(routes=routes, nodes=nodes, start_balance=START)
+    arbitrage = Arbitrage()
+
+    fx = [node for node in nodes.values() if isinstance(node, FixedRate)]
+    ever_profitable = set()
+    for _ in range(10):
+        changed = rnd.sample(fx, k=rnd.randint(0, 5))
+        for node in changed:
+            move(rnd, node)
+        book.update(changed=changed)
+
+        expected = {i: perc for perc, i, _, _ in arbitrage.score_routes(start_balance=START, routes=routes)}
+        assert book.end_values.tolist() == pytest.approx([START.value * (1 + expected[i] / 100) for i in range(len(routes))], rel=1e-12)
+        assert book.profitable.keys() == {i for i, perc in expected.items() if perc > 0}
+        for i, perc in book.profitable.items():
+            assert perc == pytest.approx(expected[i], rel=1e-9)
+        ever_profitable |= book.profitable.keys()
+
+    assert ever_profitable
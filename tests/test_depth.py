@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+import pytest
+
+from arbitrage_helper.node.depth import Depth, AdBook
+from arbitrage_helper.node.p2p import BinanceP2P
+
+
+# Asks: 1 at 100, 2 at 110, 3 at 120 -> cumulative quote 100, 320, 680
+ASKS = Depth(prices=[100.0, 110.0, 120.0], volumes=[1.0, 2.0, 3.0])
+# Bids: 1 at 90, 2 at 80 -> cumulative quote 90, 250
+BIDS = Depth(prices=[90.0, 80.0], volumes=[1.0, 2.0])
+
+
+def test_exact_level_hits():
+    assert ASKS.buy(100.0) == pytest.approx(1.0)
+    assert ASKS.buy(320.0) == pytest.approx(3.0)
+    assert ASKS.buy(680.0) == pytest.approx(6.0)
+    assert BIDS.sell(1.0) == pytest.approx(90.0)
+    assert BIDS.sell(3.0) == pytest.approx(250.0)
+
+
+def test_partial_levels():
+    assert ASKS.buy(50.0) == pytest.approx(0.5)
+    assert ASKS.buy(100.0 + 55.0) == pytest.approx(1.5)
+    assert ASKS.buy(320.0 + 60.0) == pytest.approx(3.5)  # Partial last level
+    assert BIDS.sell(0.25) == pytest.approx(22.5)
+    assert BIDS.sell(2.5) == pytest.approx(90.0 + 1.5 * 80.0)
+    assert ASKS.buy(0.0) == 0.0 and BIDS.sell(0.0) == 0.0
+
+
+def test_exhausted_depth_is_nan():
+    assert math.isnan(ASKS.buy(680.01))
+    assert math.isnan(BIDS.sell(3.5))
+
+
+def test_walk_vectorized():
+    amounts = np.array([0.0, 50.0, 100.0, 380.0, 680.0, 1000.0])
+    out = ASKS.buy(amounts)
+    np.testing.assert_allclose(out, [ASKS.buy(float(a)) for a in amounts])
+    assert np.isnan(out[-1]) and not np.isnan(out[:-1]).any()
+
+
+def test_ads_fill_whole_within_limits():
+    # Asks, cheapest ad only takes 1000..5000, the next one up to 2 units
+    book = AdBook(prices=[100.0, 101.0, 105.0], volumes=[100.0, 2.0, 100.0],
+                  min_quote=[1000.0, 0.0, 50.0], max_quote=[5000.0, 10000.0, 300.0])
+
+    assert book.buy(2000.0) == pytest.approx(20.0)  # Cheapest ad
+    assert book.buy(150.0) == pytest.approx(150.0 / 101)  # Under the cheapest ad's min
+    assert book.buy(202.0) == pytest.approx(2.0)  # Whole tradable volume of the second ad
+    assert book.buy(250.0) == pytest.approx(250.0 / 105)  # Over it, third ad's max still holds
+    assert math.isnan(book.buy(6000.0))  # No single ad takes it, no walking across ads
+    assert math.isnan(book.buy(500.0))  # Between the cheapest ad's min and the others' max
+    np.testing.assert_allclose(book.buy(np.array([2000.0, 150.0, 6000.0])), [20.0, 150.0 / 101, np.nan])
+
+
+def test_p2p_depth_uses_ad_limits():
+    ads = [{"adv": {"price": "90", "tradableQuantity": "10", "minSingleTransAmount": "500", "maxSingleTransAmount": "900"}},
+           {"adv": {"price": "85", "tradableQuantity": "1"}}]
+    book = BinanceP2P._depth(ads)
+
+    assert book.sell(6.0) == pytest.approx(540.0)
+    assert book.sell(1.0) == pytest.approx(85.0)  # 90 is below the first ad's min
+    assert math.isnan(book.sell(20.0))
+    assert BinanceP2P._depth([]) is None
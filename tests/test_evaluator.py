@@ -0,0 +1,68 @@
+from typing import *
+import random
+
+import numpy as np
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.node.depth import Depth
+from arbitrage_helper.route import Route
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.evaluator import RouteEvaluator
+from arbitrage_helper.currency import *
+
+
+CURRENCIES = [Fiat.USD, Fiat.RUB, Stable.USDT, Crypto.BTC]
+VALUES = {Fiat.USD: 1.0, Fiat.RUB: 0.011, Stable.USDT: 1.0, Crypto.BTC: 30000.0}
+
+
+def random_book(rnd: random.Random, price: float, side: int) -> Depth:
+    """Levels getting worse away from price, side is +1 for asks and -1 for bids"""
+    levels = rnd.randint(1, 6)
+    prices = price * (1 + side * np.cumsum([0.0] + [rnd.uniform(0.001, 0.05) for _ in range(levels - 1)]))
+    volumes = [rnd.uniform(0.1, 5.0) * 1000 / VALUES[Crypto.BTC] for _ in range(levels)]
+    return Depth(prices=prices, volumes=volumes)
+
+
+def random_nodes(rnd: random.Random) -> Dict[str, GenericNode]:
+    """Top-of-book and depth pairs, some in trader mode, plus fee nodes"""
+    nodes = []
+    for base, quote in [(b, q) for i, b in enumerate(CURRENCIES) for q in CURRENCIES[i+1:]]:
+        for venue in range(2):
+            mid = VALUES[base] / VALUES[quote] * rnd.uniform(0.98, 1.02)
+            node = FixedRate(base, quote, buy_price=mid * 1.002, sell_price=mid * 0.998, name=f"Venue{venue}")
+            if rnd.random() < 0.5:
+                node._asks = random_book(rnd, node._buy_price, side=1)
+                node._bids = random_book(rnd, node._sell_price, side=-1)
+            node.trader_mode = rnd.random() < 0.2
+            nodes.append(node)
+
+    for currency in CURRENCIES:
+        nodes.append(FixedFee(currency, fee_value=rnd.uniform(0, 0.01) / VALUES[currency], name="Withdraw"))
+    nodes.append(PercFee(fee_perc=rnd.uniform(0, 1), name="Transfer"))
+
+    return {node.repr: node for node in nodes}
+
+
+def random_route(rnd: random.Random, nodes: Dict[str, GenericNode], currency: CEnum, size: int) -> Route:
+    """Random walk over nodes touching the current currency, PercFee applies to any, loops don't have to close"""
+    route_nodes = []
+    for _ in range(size):
+        node = rnd.choice([node for node in nodes.values() if currency in (node.base, node.quote) or isinstance(node, PercFee)])
+        route_nodes.append(node)
+        currency = node.currency_convert(currency) or currency
+    return Route(route_nodes)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_evaluate_matches_forward(seed: int):
+    rnd = random.Random(seed)
+    nodes = random_nodes(rnd)
+    evaluator = RouteEvaluator(nodes=nodes)
+
+    for currency in CURRENCIES:
+        routes = [random_route(rnd, nodes, currency=currency, size=rnd.randint(2, 5)) for _ in range(50)]
+        for value in [100 / VALUES[currency], 100000 / VALUES[currency]]:
+            start_balance = Balance(value, currency)
+            expected = [route.forward(start_balance)[-1].value for route in routes]
+            np.testing.assert_allclose(evaluator.evaluate(routes=routes, start_balance=start_balance), expected, rtol=1e-12)
@@ -0,0 +1,149 @@
+from typing import *
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import contextvars
+import threading
+import json
+import time
+
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.node import fetch
+from arbitrage_helper.node.fetch import SessionRegistry
+from arbitrage_helper.route import RouteGenerator
+from arbitrage_helper.currency import *
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+
+    def do_GET(self):
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server() -> Generator[str, None, None]:
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_pooled_connections_are_counted(server: str):
+    registry = SessionRegistry(pool_size=2)
+    host = server.split("//")[1]
+    for _ in range(3):
+        assert registry.request("GET", server + "/").json() == {"ok": True}
+
+    stats = registry.host_stats(host)
+    assert (stats.requests, stats.connections) == (3, 1)
+    assert stats.connect_time > 0
+
+    registry.reset_stats()
+    assert registry.host_stats(host) is stats
+    assert (stats.requests, stats.connections, stats.connect_time) == (0, 0, 0.0)
+
+    # Same lock and pool keep working after the reset
+    registry.request("GET", server + "/")
+    assert (stats.requests, stats.connections) == (1, 0)
+    registry.close()
+
+
+class Response(NamedTuple):
+    content: bytes
+
+
+class SlowRegistry:
+    """Counts fetches per url, each one takes long enough for concurrent callers to pile up"""
+
+    def __init__(self, delay: float = 0.1):
+        self.delay = delay
+        self.fetches: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def request(self, method: str, url: str, **kwargs) -> Response:
+        with self._lock:
+            self.fetches[url] = self.fetches.get(url, 0) + 1
+        time.sleep(self.delay)
+        return Response(json.dumps({"url": url}).encode())
+
+
+@pytest.fixture
+def registry(monkeypatch) -> SlowRegistry:
+    registry = SlowRegistry()
+    monkeypatch.setattr(fetch, "sessions", registry)
+    return registry
+
+
+class Shared(FixedRate):
+    """Every node reads the same page"""
+
+    def parse(self):
+        self._buy_price = self._sell_price = len(fetch.get_json("https://example.com/rates")["url"])
+
+
+def test_concurrent_requests_fetch_once(registry: SlowRegistry):
+    results = []
+
+    def load():
+        results.append(fetch.get_json("https://example.com/a"))
+
+    with fetch.response_cache() as cache:
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(load, )) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert registry.fetches == {"https://example.com/a": 1}
+    assert results == [{"url": "https://example.com/a"}] * 2
+    assert (cache.misses, cache.hits) == (1, 1)
+
+
+def test_cache_doesnt_leak_across_runs(registry: SlowRegistry):
+    for _ in range(2):
+        with fetch.response_cache():
+            assert fetch.caching()
+            fetch.get_json("https://example.com/a")
+            fetch.get_json("https://example.com/a")
+        assert not fetch.caching()
+
+    fetch.get_json("https://example.com/a")
+    assert registry.fetches["https://example.com/a"] == 3
+
+    # Overlapping cycles in different threads keep their own caches
+    def cycle():
+        with fetch.response_cache():
+            fetch.get_json("https://example.com/b")
+
+    threads = [threading.Thread(target=cycle) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.fetches["https://example.com/b"] == 2
+
+
+def test_cache_reaches_executor_threads_only_through_copied_context(registry: SlowRegistry):
+    with fetch.response_cache():
+        with ThreadPoolExecutor(max_workers=2) as ex:
+            assert ex.submit(fetch.caching).result() is False
+            assert ex.submit(contextvars.copy_context().run, fetch.caching).result() is True
+
+    nodes = [Shared(Stable.USDT, currency, name="Shared") for currency in [Fiat.USD, Fiat.EUR, Fiat.RUB, Fiat.KZT]]
+    RouteGenerator().refresh_nodes(nodes={node.repr: node for node in nodes}, workers=4, progress=False)
+    assert registry.fetches == {"https://example.com/rates": 1}
+    assert all(not node.invalid for node in nodes)
@@ -0,0 +1,114 @@
+from typing import *
+import itertools
+import random
+
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route, RouteGenerator
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.arbitrage import Arbitrage
+from arbitrage_helper.graph import CurrencyGraph, ReturnTable
+from arbitrage_helper.currency import *
+
+
+START = Balance(1000, Fiat.USD)
+CURRENCIES = [Fiat.USD, Fiat.EUR, Fiat.RUB, Stable.USDT]
+
+
+def key(route: Route) -> Tuple[int, ...]:
+    return tuple(map(id, route.nodes))
+
+
+def two_triangles() -> Dict[str, GenericNode]:
+    """USD -> EUR -> RUB -> USD and USD -> USDT -> BTC -> USD pay 1%, their reverses and the rest lose"""
+    nodes = [FixedRate(Fiat.EUR, Fiat.USD, buy_price=1.0, sell_price=0.995),
+             FixedRate(Fiat.EUR, Fiat.RUB, buy_price=101.0, sell_price=100.0),
+             FixedRate(Fiat.USD, Fiat.RUB, buy_price=99.0, sell_price=98.0),
+             FixedRate(Stable.USDT, Fiat.USD, buy_price=1.0, sell_price=0.995),
+             FixedRate(Crypto.BTC, Stable.USDT, buy_price=30300.0, sell_price=30000.0),
+             FixedRate(Crypto.BTC, Fiat.USD, buy_price=29800.0, sell_price=29700.0),
+             FixedRate(Fiat.EUR, Stable.USDT, buy_price=1.1, sell_price=0.9, name="Wide"),
+             FixedRate(Fiat.RUB, Crypto.BTC, buy_price=0.0, sell_price=0.0, name="Broken")]
+    return {node.repr: node for node in nodes}
+
+
+def test_rate_without_price():
+    broken = FixedRate(Fiat.RUB, Crypto.BTC, buy_price=0.0, sell_price=-1.0)
+    assert broken.rate(Crypto.BTC) == 0.0
+    assert broken.rate(Fiat.RUB) == 0.0
+    with pytest.raises(ValueError):
+        broken.rate(Fiat.USD)
+
+
+def test_graph_skips_non_positive_prices():
+    graph = CurrencyGraph(nodes=two_triangles())
+    assert all(node.name != "Broken" for _, _, _, node in graph.edges)
+
+
+def test_cycles_match_enumeration():
+    nodes = two_triangles()
+    found = CurrencyGraph(nodes=nodes).profitable_routes(currency=START.currency)
+
+    # The scan drops invalid nodes before enumerating, the graph has to cope with them
+    valid = {alias: node for alias, node in nodes.items() if not node.invalid}
+    arbitrage = Arbitrage()
+    routes = [route for size in range(2, 4) for route in RouteGenerator().smartgen_loop_routes(nodes=valid, size=size, currency=START.currency)]
+    expected = {key(route) for _, _, route, _ in arbitrage.select_best(arbitrage.score_routes(start_balance=START, routes=routes))}
+
+    assert len(expected) == 2
+    assert {key(route) for route in found} == expected
+
+
+def random_nodes(seed: int) -> Dict[str, GenericNode]:
+    rnd = random.Random(seed)
+    nodes = []
+    for venue in range(2):
+        for base, quote in itertools.combinations(CURRENCIES, 2):
+            if rnd.random() < 0.7:
+                mid = rnd.lognormvariate(0, 1)
+                nodes.append(FixedRate(base, quote, buy_price=mid * rnd.uniform(1.0, 1.05), sell_price=mid * rnd.uniform(0.95, 1.0),
+                                       name=f"Venue{venue}"))
+    nodes.append(FixedFee(Fiat.USD, fee_value=0.1, name="Withdraw"))
+    return {node.repr: node for node in nodes}
+
+
+def walk_return(route_nodes: Sequence[GenericNode], src: CEnum) -> Tuple[float, Optional[CEnum]]:
+    """Product of rates along the walk and the currency it ends in, None if a node doesn't take the currency"""
+    rate, currency = 1.0, src
+    for node in route_nodes:
+        if currency not in (node.base, node.quote):
+            return 0.0, None
+        rate *= node.rate(currency)
+        currency = node.currency_convert(currency)
+    return rate, currency
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_return_table_matches_brute_force(seed: int):
+    nodes = random_nodes(seed)
+    table = ReturnTable(nodes=nodes, max_hops=4)
+    converting = [node for node in nodes.values() if node.base != node.quote]
+
+    for hops in range(1, table.max_hops + 1):
+        best = {}
+        for src in table.currencies:
+            for route_nodes in itertools.product(converting, repeat=hops):
+                rate, dst = walk_return(route_nodes, src=src)
+                if dst is not None:
+                    best[src, dst] = max(best.get((src, dst), 0.0), rate)
+
+        for src, dst in itertools.product(table.currencies, repeat=2):
+            assert table.best_return(src=src, dst=dst, hops=hops) == pytest.approx(best.get((src, dst), 0.0), rel=1e-12)
+            if (route := table.route(src=src, dst=dst, hops=hops)) is not None:
+                assert walk_return(route.nodes, src=src) == (pytest.approx(best[src, dst], rel=1e-12), dst)
+
+
+def test_return_table_is_an_upper_bound():
+    """Back and forth over one node is allowed in the table, the generator never builds it"""
+    node = FixedRate(Fiat.EUR, Fiat.USD, buy_price=1.0, sell_price=1.0)
+    table = ReturnTable(nodes={node.repr: node}, max_hops=2)
+
+    assert table.best_return(src=Fiat.USD, dst=Fiat.USD, hops=2) == 1.0
+    assert table.route(src=Fiat.USD, dst=Fiat.USD, hops=2).nodes == [node, node]
+    assert not list(RouteGenerator().smartgen_loop_routes(nodes={node.repr: node}, size=2, currency=Fiat.USD))
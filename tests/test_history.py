@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+
+from arbitrage_helper.node import *
+from arbitrage_helper.history import QuoteRecorder, QUOTE_COLUMNS
+from arbitrage_helper.currency import *
+
+
+def snapshot(scale: float):
+    nodes = [FixedRate(Stable.USDT, Fiat.RUB, buy_price=91 * scale, sell_price=90 * scale, name="A"),
+             FixedRate(Crypto.BTC, Stable.USDT, buy_price=30100 * scale, sell_price=30000 * scale, name="B"),
+             FixedRate(Crypto.BTC, Fiat.RUB, name="Unparsed")]
+    return {node.repr: node for node in nodes}
+
+
+def test_columns_round_trip(tmp_path):
+    recorder = QuoteRecorder(str(tmp_path))
+    first = snapshot(1.0)
+    recorder.append(first, latencies={next(iter(first)): 0.25}, ts=100.0)
+    recorder.append(snapshot(1.5), ts=101.0)
+
+    for name, dtype in QUOTE_COLUMNS.items():
+        assert os.path.getsize(recorder.column_path(name)) == 6 * dtype.itemsize
+
+    rows = QuoteRecorder(str(tmp_path)).read()
+    assert rows["ts"].tolist() == [100.0] * 3 + [101.0] * 3
+    assert rows["node"].tolist() == [0, 1, 2, 0, 1, 2]
+    assert rows["buy"][[0, 1, 3, 4]].tolist() == [91.0, 30100.0, 136.5, 45150.0]
+    assert rows["sell"][[0, 1, 3, 4]].tolist() == [90.0, 30000.0, 135.0, 45000.0]
+    assert rows["valid"].tolist() == [True, True, False] * 2
+    assert rows["latency"][0] == np.float32(0.25) and np.isnan(rows["latency"][1:]).all()
+
+
+def test_torn_row_is_truncated(tmp_path):
+    recorder = QuoteRecorder(str(tmp_path))
+    recorder.append(snapshot(1.0), ts=100.0)
+
+    # Crash mid-append: one column got a whole extra row, another half a value
+    with open(recorder.column_path("ts"), "ab") as file:
+        file.write(np.float64(101.0).tobytes())
+    with open(recorder.column_path("buy"), "ab") as file:
+        file.write(np.float64(1.0).tobytes()[:3])
+
+    reopened = QuoteRecorder(str(tmp_path))
+    for name, dtype in QUOTE_COLUMNS.items():
+        assert os.path.getsize(reopened.column_path(name)) == 3 * dtype.itemsize
+
+    # Appends after the truncation stay aligned
+    reopened.append(snapshot(2.0), ts=102.0)
+    rows = reopened.read()
+    assert rows["ts"].tolist() == [100.0] * 3 + [102.0] * 3
+    assert rows["buy"][[0, 3]].tolist() == [91.0, 182.0]
+    assert rows["node"].tolist() == [0, 1, 2, 0, 1, 2]
@@ -0,0 +1,57 @@
+import json
+
+from arbitrage_helper.node import *
+from arbitrage_helper.metrics import Metrics
+from arbitrage_helper.node.exchange.kase import KASE_EURKZT, KASE_USDKZT
+from arbitrage_helper.currency import *
+
+
+def filled() -> Metrics:
+    metrics = Metrics(enabled=True)
+    for node, latency, outcome in [(KASE_EURKZT(), 0.5, "ok"), (KASE_USDKZT(), 1.5, "error")]:
+        metrics.node_parsed(source=node.source(), latency=latency, outcome=outcome)
+    metrics.routes("generated", 10)
+    metrics.routes("generated", 5)
+    return metrics
+
+
+def test_source_is_the_venue():
+    assert KASE_EURKZT.source() == KASE_USDKZT().source() == "KASE"
+    assert FixedRate(Stable.USDT, Fiat.USD).source() == "FixedRate"
+
+
+def test_prometheus():
+    assert filled().prometheus() == "\n".join([
+        '# HELP arbitrage_node_parse_seconds Parse latency per source, whole call for batched classes',
+        '# TYPE arbitrage_node_parse_seconds summary',
+        'arbitrage_node_parse_seconds_count{source="KASE"} 2',
+        'arbitrage_node_parse_seconds_sum{source="KASE"} 2.0',
+        '# HELP arbitrage_node_parse_seconds_max Max of arbitrage_node_parse_seconds',
+        '# TYPE arbitrage_node_parse_seconds_max gauge',
+        'arbitrage_node_parse_seconds_max{source="KASE"} 1.5',
+        '# HELP arbitrage_node_parse_total Parses per source and outcome, ok / invalid (prices left at class defaults) / error',
+        '# TYPE arbitrage_node_parse_total counter',
+        'arbitrage_node_parse_total{outcome="error",source="KASE"} 1',
+        'arbitrage_node_parse_total{outcome="ok",source="KASE"} 1',
+        '# HELP arbitrage_routes_total Routes per stage, generated / pruned_rules / pruned_bound / evaluated / profitable',
+        '# TYPE arbitrage_routes_total counter',
+        'arbitrage_routes_total{stage="generated"} 15',
+    ]) + "\n"
+
+
+def test_json_lines():
+    lines = [json.loads(line) for line in filled().json_lines(ts=100.0).splitlines()]
+    assert lines == [
+        {"ts": 100.0, "metric": "arbitrage_node_parse_seconds_count", "labels": {"source": "KASE"}, "value": 2},
+        {"ts": 100.0, "metric": "arbitrage_node_parse_seconds_sum", "labels": {"source": "KASE"}, "value": 2.0},
+        {"ts": 100.0, "metric": "arbitrage_node_parse_seconds_max", "labels": {"source": "KASE"}, "value": 1.5},
+        {"ts": 100.0, "metric": "arbitrage_node_parse_total", "labels": {"outcome": "error", "source": "KASE"}, "value": 1},
+        {"ts": 100.0, "metric": "arbitrage_node_parse_total", "labels": {"outcome": "ok", "source": "KASE"}, "value": 1},
+        {"ts": 100.0, "metric": "arbitrage_routes_total", "labels": {"stage": "generated"}, "value": 15},
+    ]
+
+
+def test_disabled_records_nothing():
+    metrics = Metrics()
+    metrics.node_parsed(source="KASE", latency=1.0, outcome="ok")
+    assert metrics.prometheus() == "\n" and metrics.json_lines() == ""
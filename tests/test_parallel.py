@@ -0,0 +1,68 @@
+from typing import *
+import itertools
+import random
+
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import RouteGenerator, LoopRules
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.arbitrage import Arbitrage
+from arbitrage_helper.parallel import ParallelEnumerator
+from arbitrage_helper.currency import *
+
+
+CURRENCIES = [Fiat.USD, Fiat.EUR, Fiat.RUB, Stable.USDT, Crypto.BTC]
+
+
+def random_nodes(seed: int, n_nodes: int = 30) -> Dict[str, GenericNode]:
+    """Noisy prices around one value per currency, so some loops are profitable"""
+    rnd = random.Random(seed)
+    values = {c: rnd.lognormvariate(0, 2) for c in CURRENCIES}
+    pairs = list(itertools.combinations(CURRENCIES, 2))
+    nodes = []
+    for i in range(n_nodes):
+        base, quote = pairs[i % len(pairs)]
+        mid = values[base] / values[quote] * (1 + rnd.uniform(-0.01, 0.01))
+        nodes.append(FixedRate(base, quote, buy_price=mid * 1.001, sell_price=mid * 0.999, name=f"Venue{i // len(pairs)}"))
+    nodes.append(FixedFee(Fiat.USD, fee_value=0.5, name="Withdraw"))
+    return {node.repr: node for node in nodes}
+
+
+def serial(nodes: Dict[str, GenericNode], start_balance: Balance, max_size: int, rules: LoopRules,
+           min_profit: float) -> Dict[Tuple[int, ...], float]:
+    arbitrage = Arbitrage()
+    routes = (route for size in range(2, max_size + 1)
+              for route in RouteGenerator().smartgen_loop_routes(nodes=nodes, size=size, currency=start_balance.currency, rules=rules))
+    return {tuple(map(id, route.nodes)): perc for perc, _, route, _ in
+            arbitrage.select_best(arbitrage.score_routes(start_balance=start_balance, routes=routes)) if perc > min_profit}
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("rules", [LoopRules(), LoopRules(no_repeat=True),
+                                   LoopRules(no_reversal=False, no_repeat=False, no_start_revisit=False)])
+@pytest.mark.parametrize("min_profit", [0.0, 0.5])
+def test_parallel_matches_serial(seed: int, rules: LoopRules, min_profit: float):
+    nodes = random_nodes(seed)
+    start_balance = Balance(1000, Fiat.USD)
+
+    expected = serial(nodes, start_balance=start_balance, max_size=4, rules=rules, min_profit=min_profit)
+    found = ParallelEnumerator(nodes=nodes, rules=rules).run(start_balance=start_balance, max_size=4, processes=2,
+                                                             min_profit=min_profit)
+    found = {tuple(map(id, route.nodes)): perc for perc, _, route, _ in found}
+
+    assert expected
+    assert found.keys() == expected.keys()
+    for key, perc in expected.items():
+        assert found[key] == pytest.approx(perc, rel=1e-12, abs=1e-12)
+
+
+def test_parallel_top_k():
+    nodes = random_nodes(0)
+    start_balance = Balance(1000, Fiat.USD)
+    expected = sorted(serial(nodes, start_balance=start_balance, max_size=4, rules=LoopRules(), min_profit=0.0).values())
+
+    enumerator = ParallelEnumerator(nodes=nodes)
+    found = enumerator.run(start_balance=start_balance, max_size=4, processes=2, top_k=5)
+    assert [perc for perc, *_ in found] == pytest.approx(expected[-5:], rel=1e-12)
+    assert enumerator.profitable == len(expected)
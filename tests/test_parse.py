@@ -0,0 +1,32 @@
+from typing import *
+
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import RouteGenerator
+from arbitrage_helper.currency import *
+
+
+class Broken(FixedRate):
+    def parse(self):
+        raise ConnectionError(self.repr)
+
+
+class Quoted(FixedRate):
+    def parse(self):
+        self._buy_price, self._sell_price = 1.01, 0.99
+
+
+OK = Quoted(Stable.USDT, Fiat.USD, name="Ok")
+DOWN = Broken(Stable.USDT, Fiat.RUB, name="Down")
+
+
+@pytest.mark.parametrize("parse", ["parse_nodes", "parse_nodes_async"])
+def test_parse_errors_are_kept(parse: str):
+    generator = RouteGenerator()
+    parsed = getattr(generator, parse)(nodes={OK.repr: OK, DOWN.repr: DOWN})
+
+    assert list(parsed) == [OK.repr]
+    assert list(generator.errors) == [DOWN.repr]
+    assert isinstance(generator.errors[DOWN.repr], ConnectionError)
+    assert generator.latencies.keys() == {OK.repr, DOWN.repr}
@@ -0,0 +1,121 @@
+from typing import *
+import itertools
+import random
+
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route, RouteGenerator, LoopRules
+from arbitrage_helper.balance import Balance
+from arbitrage_helper.currency import *
+
+
+CURRENCIES = [Fiat.USD, Fiat.EUR, Fiat.RUB, Stable.USDT]
+RULES = [LoopRules(no_reversal=a, no_repeat=b, no_start_revisit=c) for a, b, c in itertools.product([False, True], repeat=3)]
+
+
+def key(route: Route) -> Tuple[int, ...]:
+    return tuple(map(id, route.nodes))
+
+
+def brute_force(nodes: Dict[str, GenericNode], size: int, currency: CEnum, rules: LoopRules) -> List[Route]:
+    """Every sequence of size nodes that closes on currency and passes rules"""
+    routes = [Route(list(route_nodes)) for route_nodes in itertools.product(nodes.values(), repeat=size)]
+    return [route for route in routes if route.evaluate_loop(currency=currency, size=size) and route.is_canonical(currency=currency, rules=rules)]
+
+
+def random_nodes(seed: int) -> Dict[str, GenericNode]:
+    """Wide random spreads so a good share of loops is profitable, plus a fixed fee"""
+    rnd = random.Random(seed)
+    nodes = []
+    for venue in range(2):
+        for base, quote in itertools.combinations(CURRENCIES, 2):
+            if rnd.random() < 0.7:
+                mid = rnd.lognormvariate(0, 1)
+                nodes.append(FixedRate(base, quote, buy_price=mid * rnd.uniform(1.0, 1.05), sell_price=mid * rnd.uniform(0.95, 1.0),
+                                       name=f"Venue{venue}"))
+    nodes.append(FixedFee(Fiat.USD, fee_value=0.1, name="Withdraw"))
+    return {node.repr: node for node in nodes}
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("rules", RULES)
+@pytest.mark.parametrize("min_profit", [0.0, 1.0, 3.0])
+def test_bound_pruning_keeps_profitable_routes(seed: int, rules: LoopRules, min_profit: float):
+    nodes = random_nodes(seed)
+    start_balance = Balance(1000, Fiat.USD)
+
+    for size in range(2, 5):
+        pruned = {key(route) for route in RouteGenerator().smartgen_loop_routes(nodes=nodes, size=size, currency=Fiat.USD, rules=rules,
+                                                                               min_profit=min_profit)}
+        everything = brute_force(nodes, size=size, currency=Fiat.USD, rules=rules)
+        profitable = {key(route) for route in everything
+                      if (route.forward(start_balance)[-1].value / start_balance.value - 1) * 100 > min_profit}
+
+        assert profitable <= pruned <= {key(route) for route in everything}
+
+
+def fixed_nodes() -> Dict[str, GenericNode]:
+    """Two EUR/USD venues A1 and A2, R for USD/RUB, X for EUR/RUB, a USD fee F"""
+    nodes = [FixedRate(Fiat.EUR, Fiat.USD, name="A1"), FixedRate(Fiat.EUR, Fiat.USD, name="A2"), FixedRate(Fiat.USD, Fiat.RUB, name="R"),
+             FixedRate(Fiat.EUR, Fiat.RUB, name="X"), FixedFee(Fiat.USD, name="F")]
+    return {node.repr: node for node in nodes}
+
+
+def names(routes: Iterable[Route]) -> Set[str]:
+    return {" ".join(node.name for node in route.nodes) for route in routes}
+
+
+def test_adjacency():
+    nodes = fixed_nodes()
+    generator = RouteGenerator()
+    adjacency = generator.adjacency(nodes)
+    assert {c: [node.name for node in accepted] for c, accepted in adjacency.items()} == {
+        Fiat.USD: ["A1", "A2", "R", "F"], Fiat.EUR: ["A1", "A2", "X"], Fiat.RUB: ["R", "X"]}
+
+    # Rebuilt only when the node set changes
+    assert generator.adjacency(dict(nodes)) is adjacency
+    del nodes[next(iter(nodes))]
+    assert [node.name for node in generator.adjacency(nodes)[Fiat.EUR]] == ["A2", "X"]
+
+
+def test_default_routes():
+    nodes = fixed_nodes()
+    generator = RouteGenerator()
+    assert names(generator.smartgen_loop_routes(nodes=nodes, size=2, currency=Fiat.USD)) == {"A1 A2", "A2 A1"}
+    assert names(generator.smartgen_loop_routes(nodes=nodes, size=3, currency=Fiat.USD)) == {
+        "A1 X R", "A2 X R", "R X A1", "R X A2", "F A1 A2", "F A2 A1"}
+
+
+DEFAULT_LOOPS = {"A1 X R", "A2 X R", "R X A1", "R X A2", "F A1 A2", "F A2 A1"}
+REVISITS = {"A1 A2 F", "A2 A1 F"}  # USD in the middle of the loop
+REVERSALS = {"F A1 A1", "F A2 A2", "F R R", "F F F"}  # Same node twice in a row, never passing USD before the end
+REVERSALS_REVISITING = {"A1 A1 F", "A2 A2 F", "R R F"}
+
+
+@pytest.mark.parametrize("rules, size_2, size_3", [
+    (LoopRules(), {"A1 A2", "A2 A1"}, DEFAULT_LOOPS),
+    (LoopRules(no_reversal=False, no_repeat=False, no_start_revisit=False),
+     {"A1 A1", "A1 A2", "A2 A1", "A2 A2", "R R", "F F"}, DEFAULT_LOOPS | REVISITS | REVERSALS | REVERSALS_REVISITING),
+    (LoopRules(no_reversal=True, no_repeat=False, no_start_revisit=False), {"A1 A2", "A2 A1"}, DEFAULT_LOOPS | REVISITS),
+    (LoopRules(no_reversal=False, no_repeat=True, no_start_revisit=False), {"A1 A2", "A2 A1"}, DEFAULT_LOOPS | REVISITS),
+    (LoopRules(no_reversal=False, no_repeat=False, no_start_revisit=True),
+     {"A1 A1", "A1 A2", "A2 A1", "A2 A2", "R R", "F F"}, DEFAULT_LOOPS | REVERSALS),
+])
+def test_loop_rules(rules: LoopRules, size_2: Set[str], size_3: Set[str]):
+    nodes = fixed_nodes()
+    for size, expected in [(2, size_2), (3, size_3)]:
+        assert names(RouteGenerator().smartgen_loop_routes(nodes=nodes, size=size, currency=Fiat.USD, rules=rules)) == expected
+        assert names(brute_force(nodes, size=size, currency=Fiat.USD, rules=rules)) == expected
+
+
+def test_no_repeat_apart():
+    """A node coming back after another one is only cut by no_repeat"""
+    nodes = fixed_nodes()
+    permissive = LoopRules(no_reversal=True, no_repeat=False, no_start_revisit=False)
+    routes = names(RouteGenerator().smartgen_loop_routes(nodes=nodes, size=4, currency=Fiat.USD, rules=permissive))
+    assert {"A1 A2 A1 A2", "F A1 A2 F", "R X A1 F"} <= routes
+
+    strict = permissive._replace(no_repeat=True)
+    assert names(RouteGenerator().smartgen_loop_routes(nodes=nodes, size=4, currency=Fiat.USD, rules=strict)) == {
+        route for route in routes if len(set(route.split())) == 4}
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from arbitrage_helper.node import *
+from arbitrage_helper.node.depth import Depth, AdBook
+from arbitrage_helper.route import Route
+from arbitrage_helper.sizing import TradeSizer
+from arbitrage_helper.currency import *
+
+
+MAX_AMOUNT = 10000.0
+
+
+def route(asks: Depth) -> Route:
+    """USD -> USDT on asks, back at par, minus a fixed fee"""
+    buy = FixedRate(Stable.USDT, Fiat.USD, buy_price=asks.best_price, sell_price=asks.best_price, name="Buy")
+    buy._asks = asks
+    sell = FixedRate(Stable.USDT, Fiat.USD, buy_price=1.0, sell_price=1.0, name="Sell")
+    return Route([buy, sell, FixedFee(Fiat.USD, fee_value=1.0, name="Withdraw")])
+
+
+def sweep(sizer: TradeSizer, route: Route) -> float:
+    profit = sizer.profit(route=route, currency=Fiat.USD, amounts=np.linspace(0.0, MAX_AMOUNT, 200001))
+    return float(np.nanmax(profit))
+
+
+def test_concave_book_matches_sweep():
+    asks = Depth(prices=[0.97, 0.98, 0.99, 1.0, 1.01], volumes=[1000.0, 2000.0, 2000.0, 3000.0, 1e6])
+    sizer = TradeSizer()
+    sizing = sizer.size(route=route(asks), currency=Fiat.USD, max_amount=MAX_AMOUNT)
+    assert sizing.profit == pytest.approx(sweep(sizer, route(asks)), rel=1e-6)
+
+
+def test_step_book_matches_sweep():
+    # Small profit in a wide band, the best one in a narrow band no coarse grid point lands on
+    asks = AdBook(prices=[0.9, 0.98, 0.995, 1.01], volumes=[1e6] * 4,
+                  min_quote=[6050.0, 1000.0, 0.0, 0.0], max_quote=[6150.0, 3000.0, 100.0, MAX_AMOUNT])
+    sizer = TradeSizer()
+    sizing = sizer.size(route=route(asks), currency=Fiat.USD, max_amount=MAX_AMOUNT)
+
+    best = sweep(sizer, route(asks))
+    assert best > 600
+    assert sizing.profit == pytest.approx(best, rel=1e-3)
+    assert 6050.0 <= sizing.amount <= 6150.0
+    assert sizing.perc == pytest.approx(sizing.profit / sizing.amount * 100)
@@ -0,0 +1,52 @@
+from typing import *
+import itertools
+import os
+
+from arbitrage_helper.node import *
+from arbitrage_helper.route import Route, RouteGenerator, LoopRules
+from arbitrage_helper.topology import TopologyCache
+from arbitrage_helper.currency import *
+
+
+CURRENCIES = [Fiat.USD, Fiat.EUR, Fiat.RUB, Stable.USDT]
+
+
+def nodes() -> Dict[str, GenericNode]:
+    nodes = [FixedRate(base, quote, buy_price=1.01, sell_price=0.99, name=f"Venue{venue}")
+             for venue in range(2) for base, quote in itertools.combinations(CURRENCIES, 2)]
+    nodes.append(FixedFee(Fiat.USD, fee_value=0.1, name="Withdraw"))
+    return {node.repr: node for node in nodes}
+
+
+def reprs(routes: List[Route]) -> List[Tuple[str, ...]]:
+    return [tuple(node.repr for node in route.nodes) for route in routes]
+
+
+def test_round_trip(tmp_path):
+    cache = TopologyCache(str(tmp_path))
+    for size in range(2, 5):
+        expected = reprs(list(RouteGenerator().smartgen_loop_routes(nodes=nodes(), size=size, currency=Fiat.USD)))
+        assert cache.load(nodes=nodes(), currency=Fiat.USD, size=size) is None
+
+        # Miss enumerates and stores, a hit on fresh node objects rebuilds the same routes on them
+        assert reprs(cache.routes(route_gen=RouteGenerator(), nodes=nodes(), currency=Fiat.USD, size=size)) == expected
+        assert os.path.exists(cache.path(nodes=nodes(), currency=Fiat.USD, size=size))
+
+        fresh = nodes()
+        cached = cache.routes(route_gen=RouteGenerator(), nodes=fresh, currency=Fiat.USD, size=size)
+        assert reprs(cached) == expected
+        assert all(node is fresh[node.repr] for route in cached for node in route.nodes)
+
+
+def test_key_covers_version_and_rules(tmp_path, monkeypatch):
+    cache = TopologyCache(str(tmp_path))
+    key = cache.key(nodes=nodes(), currency=Fiat.USD, size=3)
+
+    assert cache.key(nodes=nodes(), currency=Fiat.USD, size=3, rules=LoopRules(no_repeat=True)) != key
+    assert cache.key(nodes=nodes(), currency=Fiat.EUR, size=3) != key
+    assert cache.key(nodes=nodes(), currency=Fiat.USD, size=4) != key
+
+    cache.routes(route_gen=RouteGenerator(), nodes=nodes(), currency=Fiat.USD, size=3)
+    monkeypatch.setattr(TopologyCache, "VERSION", TopologyCache.VERSION + 1)
+    assert cache.key(nodes=nodes(), currency=Fiat.USD, size=3) != key
+    assert cache.load(nodes=nodes(), currency=Fiat.USD, size=3) is None